@@ -0,0 +1,158 @@
+"""
+Admission control for the Flask API.
+
+Expensive routes (recommendations and search) run in named pools, each with
+a concurrency limit and a bounded queue. When a pool is saturated and its
+queue is full, or a queued request waits longer than ``QUEUE_TIMEOUT``, the
+request is rejected right away with 503 and ``Retry-After`` instead of piling
+up behind slow work. Each client also has a token bucket on those routes
+(429 when empty). Cheap routes such as /popular, /health and /ready are not
+decorated, so a burst of searches never delays them.
+
+All limits are per process and configurable through environment variables;
+a concurrency or rate of 0 disables the corresponding limit.
+"""
+
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request
+
+from serialization import respond
+
+# Per-pool limits: (concurrent requests, queued requests)
+POOLS = {
+    "recommend": (int(os.environ.get("RECOMMEND_CONCURRENCY", 4)), int(os.environ.get("RECOMMEND_QUEUE", 16))),
+    "search": (int(os.environ.get("SEARCH_CONCURRENCY", 2)), int(os.environ.get("SEARCH_QUEUE", 8))),
+}
+QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", 1.0))  # seconds
+
+# Per-client token bucket on the pooled routes
+RATE_LIMIT = float(os.environ.get("RATE_LIMIT_PER_SECOND", 10))
+RATE_BURST = int(os.environ.get("RATE_LIMIT_BURST", 20))
+
+# Reverse proxies in front of the app that append to X-Forwarded-For (the
+# Spaces proxy is one); 0 trusts no header and keys clients on the socket
+# address
+TRUSTED_PROXY_HOPS = int(os.environ.get("TRUSTED_PROXY_HOPS", 1))
+
+
+class ConcurrencyLimiter:
+    """At most ``limit`` concurrent holders, with at most ``max_queue`` waiting"""
+
+    def __init__(self, limit, max_queue=0, timeout=QUEUE_TIMEOUT):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.waiting = 0
+
+    def acquire(self):
+        """Take a slot, waiting in the queue if there is room; False if rejected"""
+        acquired = self._slots.acquire(blocking=False)
+        if not acquired:
+            with self._lock:
+                if self.waiting >= self.max_queue:
+                    return False
+                self.waiting += 1
+            try:
+                acquired = self._slots.acquire(timeout=self.timeout)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+        if acquired:
+            with self._lock:
+                self.active += 1
+        return acquired
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
+        self._slots.release()
+
+
+class TokenBuckets:
+    """One token bucket per client: ``rate`` tokens a second, up to ``burst``.
+
+    At most ``max_clients`` buckets are kept; the least recently used one is
+    evicted first.
+    """
+
+    def __init__(self, rate, burst, max_clients=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, client):
+        """Take a token; return 0 if allowed, else the seconds until one is available"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens >= 1:
+                self._buckets[client] = (tokens - 1, now)
+                wait = 0.0
+            else:
+                self._buckets[client] = (tokens, now)
+                wait = (1 - tokens) / self.rate
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+limiters = {name: ConcurrencyLimiter(limit, queue) for name, (limit, queue) in POOLS.items() if limit > 0}
+buckets = TokenBuckets(RATE_LIMIT, RATE_BURST) if RATE_LIMIT > 0 else None
+
+
+def client_id():
+    """The requesting client, as seen by the outermost trusted proxy.
+
+    Clients can send any X-Forwarded-For they like, so only the hop appended
+    by the ``TRUSTED_PROXY_HOPS``-th proxy from the right is used (as
+    werkzeug's ProxyFix does), falling back to the socket address.
+    """
+    forwarded = request.headers.get('X-Forwarded-For')
+    if forwarded and TRUSTED_PROXY_HOPS > 0:
+        hops = [hop.strip() for hop in forwarded.split(',')]
+        if len(hops) >= TRUSTED_PROXY_HOPS:
+            return hops[-TRUSTED_PROXY_HOPS]
+    return request.remote_addr
+
+
+def admission_controlled(pool):
+    """Run a view in ``pool``: rate limited per client, bounded concurrency and queue"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if buckets is not None:
+                wait = buckets.acquire(client_id())
+                if wait > 0:
+                    return (respond({"error": "Too many requests"}), 429,
+                            {"Retry-After": str(math.ceil(wait))})
+
+            limiter = limiters.get(pool)
+            if limiter is None:
+                return view(*args, **kwargs)
+            if not limiter.acquire():
+                return (respond({"error": "Server busy, please retry"}), 503,
+                        {"Retry-After": str(max(1, math.ceil(QUEUE_TIMEOUT)))})
+            try:
+                return view(*args, **kwargs)
+            finally:
+                limiter.release()
+        return wrapper
+    return decorator
+
+
+def stats():
+    """Active and queued requests per pool"""
+    return {name: {"active": limiter.active, "queued": limiter.waiting, "limit": limiter.limit}
+            for name, limiter in limiters.items()}
@@ -0,0 +1,91 @@
+"""
+Deterministic, content-addressed model artifacts.
+
+- ``save_npz`` writes ``.npz`` files byte-for-byte reproducibly (fixed zip
+  timestamps), so identical arrays always hash the same.
+- ``BuildManifest`` records, per build stage, a key derived from the input
+  file hashes, generation parameters and code, plus the content hash of every
+  output. generate_models.py skips stages whose key and outputs are
+  unchanged, and deploy_to_huggingface.py only ships files whose content
+  hash changed.
+"""
+
+import hashlib
+import json
+import os
+import zipfile
+
+import numpy as np
+
+MANIFEST_FILE = 'build_manifest.json'
+
+# Fixed timestamp for zip members (the earliest a zip file can store)
+_ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def save_npz(path, **arrays):
+    """Write arrays as an uncompressed .npz with reproducible bytes"""
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED) as zf:
+        for name in sorted(arrays):
+            info = zipfile.ZipInfo(f"{name}.npy", date_time=_ZIP_EPOCH)
+            with zf.open(info, 'w', force_zip64=True) as f:
+                np.lib.format.write_array(f, np.asanyarray(arrays[name]), allow_pickle=False)
+
+
+class BuildManifest:
+    """Per-stage build keys and output hashes, stored as JSON"""
+
+    def __init__(self, path=MANIFEST_FILE, stages=None):
+        self.path = path
+        self.stages = stages or {}
+
+    @classmethod
+    def load(cls, path=MANIFEST_FILE):
+        if not os.path.exists(path):
+            return cls(path)
+        with open(path, encoding='utf-8') as f:
+            return cls(path, json.load(f).get('stages', {}))
+
+    def save(self):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({"stages": self.stages}, f, indent=2, sort_keys=True)
+
+    @staticmethod
+    def stage_key(input_hashes, params, code_files=()):
+        """Hash of everything a stage's outputs depend on"""
+        payload = {
+            "inputs": input_hashes,
+            "params": params,
+            "code": {os.path.basename(path): file_hash(path) for path in code_files},
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def is_fresh(self, stage, key):
+        """True if the stage was built with this key and its outputs are untouched"""
+        entry = self.stages.get(stage)
+        if entry is None or entry.get('key') != key:
+            return False
+        return all(os.path.exists(path) and file_hash(path) == digest
+                   for path, digest in entry.get('outputs', {}).items())
+
+    def record(self, stage, key, outputs):
+        self.stages[stage] = {
+            "key": key,
+            "outputs": {path: file_hash(path) for path in outputs},
+        }
+
+    def output_hashes(self):
+        """Content hash of every artifact produced by any stage"""
+        hashes = {}
+        for entry in self.stages.values():
+            hashes.update(entry.get('outputs', {}))
+        return hashes
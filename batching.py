@@ -0,0 +1,74 @@
+"""
+Micro-batching of concurrent requests.
+
+Under bursty traffic many threads ask for the same kind of work at once
+(e.g. top-k neighbors for different titles). ``MicroBatcher`` collects the
+calls that arrive within a short window, up to a maximum batch size, and
+answers them with a single call to a batch function, so one matrix gather and
+one batched argpartition replace many small ones. Identical keys in the same
+batch are computed once and share the result.
+
+There is no background thread: the first caller of a batch waits out the
+window (cut short once ``max_batch`` keys are queued), then runs the batch
+and hands every other caller its result. Batches run one at a time, so calls
+arriving while a batch runs queue up for the next one.
+"""
+
+import threading
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """Group concurrent ``submit(key)`` calls into ``process_batch(keys)`` calls.
+
+    ``process_batch`` receives a list of distinct keys and must return a list
+    of results in the same order. Results are shared between callers that
+    submitted the same key, so they must not be modified.
+    """
+
+    def __init__(self, process_batch, window=0.002, max_batch=64):
+        self.process_batch = process_batch
+        self.window = window
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._full = threading.Event()
+        self._has_leader = False
+        self._running = threading.Lock()
+
+    def submit(self, key):
+        """Return ``process_batch``'s result for ``key``, batched with concurrent calls"""
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pending[key] = Future()
+                if len(self._pending) >= self.max_batch:
+                    self._full.set()
+            leader = not self._has_leader
+            self._has_leader = True
+
+        if leader:
+            # Wait out the window (or until the batch is full) and for the
+            # previous batch to finish, then take everything queued so far;
+            # later calls start the next batch
+            if self.window > 0:
+                self._full.wait(self.window)
+            with self._running:
+                with self._lock:
+                    batch, self._pending = self._pending, {}
+                    self._has_leader = False
+                    self._full.clear()
+                self._run(batch)
+
+        return future.result()
+
+    def _run(self, batch):
+        keys = list(batch)
+        try:
+            results = self.process_batch(keys)
+        except Exception as e:
+            for future in batch.values():
+                future.set_exception(e)
+            return
+        for key, result in zip(keys, results):
+            batch[key].set_result(result)
@@ -0,0 +1,132 @@
+"""
+Two-stage recommendation: cheap candidate generation, then re-scoring.
+
+Stage one gathers a few hundred candidate titles (rows of the pivot table
+``pt``) from generators that never score the whole catalog:
+
+- ``neighbors``: the title's precomputed top-K cosine neighbors
+- ``same_author``: other titles by the same author, most rated first
+- ``popular``: the popularity list, as a fallback
+
+Stage two scores only those candidates with a weighted blend of signals:
+cosine similarity, average rating and (log) number of ratings. Adding a
+generator or a signal means adding an entry to ``GENERATORS`` or
+``SIGNALS``; the cost per request stays proportional to the candidate count.
+
+The neighbor table and per-title rating stats are built by
+generate_models.py alongside the similarity matrix and saved as
+``candidates.npz``.
+"""
+
+import numpy as np
+
+from artifacts import save_npz
+from ranking import top_k_neighbors
+
+# Neighbors kept per title in the precomputed table
+NEIGHBORS = 200
+
+# Candidates taken from each generator, in order
+CANDIDATE_LIMITS = {"neighbors": NEIGHBORS, "same_author": 100, "popular": 50}
+
+# Signal weights of the second stage
+DEFAULT_WEIGHTS = {"similarity": 1.0, "avg_rating": 0.1, "popularity": 0.1}
+
+
+class CandidateIndex:
+    """Top-K neighbor table and rating stats, aligned to rows of ``pt``"""
+
+    def __init__(self, neighbors, neighbor_scores, num_ratings, avg_rating):
+        self.neighbors = np.asarray(neighbors, dtype=np.int32)
+        self.neighbor_scores = np.asarray(neighbor_scores, dtype=np.float32)
+        self.num_ratings = np.asarray(num_ratings, dtype=np.int32)
+        self.avg_rating = np.asarray(avg_rating, dtype=np.float32)
+        self.max_num_ratings = int(self.num_ratings.max()) if len(self.num_ratings) else 0
+
+    def __len__(self):
+        return len(self.num_ratings)
+
+    @classmethod
+    def from_model(cls, similarity_scores, pt, title_stats, k=NEIGHBORS, block_size=1024):
+        """Build the index from the similarity matrix, in blocks of rows.
+
+        ``title_stats`` is indexed by title with ``num_ratings`` and
+        ``avg_rating`` columns (see generate_models.title_stats).
+        """
+        n = len(pt.index)
+        k = max(0, min(k, n - 1))
+        neighbors = np.empty((n, k), dtype=np.int32)
+        neighbor_scores = np.empty((n, k), dtype=np.float32)
+        for start in range(0, n, block_size):
+            rows = np.arange(start, min(start + block_size, n))
+            neighbors[rows], neighbor_scores[rows] = top_k_neighbors(similarity_scores, rows, k)
+
+        stats = title_stats.reindex(pt.index)
+        return cls(neighbors, neighbor_scores,
+                   stats["num_ratings"].fillna(0).to_numpy(), stats["avg_rating"].fillna(0).to_numpy())
+
+    def save(self, path):
+        save_npz(path, neighbors=self.neighbors, neighbor_scores=self.neighbor_scores,
+                 num_ratings=self.num_ratings, avg_rating=self.avg_rating)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as arrays:
+            return cls(arrays["neighbors"], arrays["neighbor_scores"],
+                       arrays["num_ratings"], arrays["avg_rating"])
+
+
+def neighbor_candidates(index, candidate_index, limit, **_):
+    return candidate_index.neighbors[index, :limit]
+
+
+def same_author_candidates(index, candidate_index, author_codes, limit, **_):
+    author = author_codes[index]
+    if author < 0:
+        return np.empty(0, dtype=np.int64)
+    rows = np.flatnonzero(author_codes == author)
+    if len(rows) > limit:
+        rows = rows[np.argpartition(-candidate_index.num_ratings[rows], limit - 1)[:limit]]
+    return rows
+
+
+def popular_candidates(index, popular_rows, limit, **_):
+    return popular_rows[:limit]
+
+
+# Candidate generators: name -> function(index, limit, **context) -> pt rows
+GENERATORS = {
+    "neighbors": neighbor_candidates,
+    "same_author": same_author_candidates,
+    "popular": popular_candidates,
+}
+
+
+def generate_candidates(index, generators=tuple(GENERATORS), limits=None, **context):
+    """Union of the candidates from each generator, excluding ``index``"""
+    limits = {**CANDIDATE_LIMITS, **(limits or {})}
+    parts = [np.asarray(GENERATORS[name](index, limit=limits[name], **context), dtype=np.int64)
+             for name in generators]
+    candidates = np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+    return candidates[candidates != index]
+
+
+# Second-stage signals: name -> function(index, candidates, **context) -> values in ~[0, 1]
+SIGNALS = {
+    "similarity": lambda index, candidates, similarity_scores, **_: np.asarray(
+        similarity_scores[index][candidates], dtype=np.float64),
+    "avg_rating": lambda index, candidates, candidate_index, **_: (
+        candidate_index.avg_rating[candidates].astype(np.float64) / 10.0),
+    "popularity": lambda index, candidates, candidate_index, **_: (
+        np.log1p(candidate_index.num_ratings[candidates]) / np.log1p(max(1, candidate_index.max_num_ratings))),
+}
+
+
+def score_candidates(index, candidates, weights=None, **context):
+    """Weighted blend of the second-stage signals for each candidate"""
+    weights = weights or DEFAULT_WEIGHTS
+    scores = np.zeros(len(candidates))
+    for name, weight in weights.items():
+        if weight:
+            scores += weight * SIGNALS[name](index, candidates, **context)
+    return scores
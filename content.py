@@ -0,0 +1,104 @@
+"""
+Content-based neighbors for cold-start titles.
+
+The collaborative model only covers titles that survive the heavy-user
+filter, a small fraction of the catalog. For every other title the API falls
+back to neighbors by content: each title is a sparse vector of hashed,
+TF-IDF weighted tokens (normalized title words plus author and publisher
+tokens), and its nearest titles are found with blocked sparse products,
+keeping only the top-k per row. The result is a compact ``(n, k)`` table
+aligned to rows of ``book_meta.npz``, built by generate_models.py and saved
+as ``content_neighbors.npz``; serving only reads rows of it.
+"""
+
+import numpy as np
+
+from artifacts import save_npz
+
+# Neighbors kept per title
+NEIGHBORS = 10
+
+# Hashed feature space for the title / author / publisher tokens
+N_FEATURES = 2 ** 20
+
+# Tokens in more than this fraction of titles carry almost no signal and make
+# the blocked products dense, so they are dropped
+MAX_TOKEN_FRACTION = 0.01
+
+
+class ContentIndex:
+    """Top-k content neighbors per book metadata row (-1 padded)"""
+
+    def __init__(self, neighbors, scores):
+        self.neighbors = np.asarray(neighbors, dtype=np.int32)
+        self.scores = np.asarray(scores, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.neighbors)
+
+    def save(self, path):
+        save_npz(path, neighbors=self.neighbors, scores=self.scores)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as arrays:
+            return cls(arrays["neighbors"], arrays["scores"])
+
+    def similar(self, meta_row, k=NEIGHBORS):
+        """Return ``(meta_rows, scores)`` of up to k titles similar to ``meta_row``"""
+        if not 0 <= meta_row < len(self.neighbors):
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        rows = self.neighbors[meta_row, :k]
+        keep = rows >= 0
+        return rows[keep].astype(np.int64), self.scores[meta_row, :k][keep].astype(np.float64)
+
+
+def content_documents(book_meta):
+    """One token string per metadata row: title words, author and publisher"""
+    return [
+        f"{book_meta.titles_lower[row]} __author{author} __publisher{publisher}"
+        for row, (author, publisher) in enumerate(zip(book_meta.author_codes.tolist(),
+                                                       book_meta.publisher_codes.tolist()))
+    ]
+
+
+def content_vectors(book_meta):
+    """L2-normalized TF-IDF vectors of the hashed content tokens (CSR)"""
+    from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+
+    vectorizer = HashingVectorizer(n_features=N_FEATURES, stop_words="english",
+                                   alternate_sign=False, norm=None)
+    counts = vectorizer.transform(content_documents(book_meta)).tocsc()
+
+    document_frequency = np.diff(counts.indptr)
+    common = np.flatnonzero(document_frequency > max(1, MAX_TOKEN_FRACTION * counts.shape[0]))
+    for column in common:
+        counts.data[counts.indptr[column]:counts.indptr[column + 1]] = 0
+    counts.eliminate_zeros()
+
+    return TfidfTransformer(norm="l2").fit_transform(counts.tocsr()).astype(np.float32)
+
+
+def build_content_index(book_meta, k=NEIGHBORS, block_size=1024):
+    """Top-k content neighbors for every title, one block of rows at a time"""
+    vectors = content_vectors(book_meta)
+    transposed = vectors.T.tocsr()
+    n = vectors.shape[0]
+    neighbors = np.full((n, k), -1, dtype=np.int32)
+    scores = np.zeros((n, k), dtype=np.float32)
+
+    for start in range(0, n, block_size):
+        block = (vectors[start:start + block_size] @ transposed).tocsr()
+        for i in range(block.shape[0]):
+            lo, hi = block.indptr[i], block.indptr[i + 1]
+            columns, values = block.indices[lo:hi], block.data[lo:hi]
+            keep = columns != start + i
+            columns, values = columns[keep], values[keep]
+            if len(values) > k:
+                top = np.argpartition(-values, k - 1)[:k]
+                columns, values = columns[top], values[top]
+            order = np.argsort(-values, kind="stable")
+            neighbors[start + i, :len(order)] = columns[order]
+            scores[start + i, :len(order)] = values[order]
+
+    return ContentIndex(neighbors, scores)
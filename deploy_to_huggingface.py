@@ -2,12 +2,43 @@
 """
 Script to help deploy the Book Recommender System to Hugging Face Spaces.
 This script will prepare your files and provide deployment instructions.
+
+The deployment directory and ``book-recommender-huggingface.zip`` always
+hold the full package (for a new Space). Files changed since the last
+*confirmed* upload also go into ``book-recommender-huggingface-changes.zip``
+(for updating an existing Space); after uploading, record it with
+``python deploy_to_huggingface.py --mark-uploaded``.
 """
 
+import argparse
+import json
 import os
 import shutil
 import zipfile
 
+from artifacts import file_hash
+
+DEPLOY_DIR = "huggingface_deployment"
+
+# Content hashes of the files last copied into the deployment directory, and
+# of the last package confirmed as uploaded. Both live in the project root
+# (next to build_manifest.json) so they are never uploaded with the package.
+DEPLOY_MANIFEST = "deploy_manifest.json"
+UPLOAD_MANIFEST = "upload_manifest.json"
+
+FULL_ZIP = "book-recommender-huggingface.zip"
+CHANGES_ZIP = "book-recommender-huggingface-changes.zip"
+
+def _read_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def _write_manifest(path, hashes):
+    with open(path, "w", encoding='utf-8') as f:
+        json.dump(hashes, f, indent=2, sort_keys=True)
+
 def create_deployment_package():
     """Create a deployment package for Hugging Face Spaces"""
     
@@ -18,14 +49,27 @@ def create_deployment_package():
     required_files = [
         'app.py',                    # Flask API
         'gradio_app.py',            # Gradio interface
+        'recommender.py',           # Recommendation engine
+        'metadata.py',              # Book metadata reader
+        'factorization.py',         # Matrix factorization model
+        'user_index.py',            # Per-user ratings index
+        'ranking.py',               # Recommendation filters and re-ranking
+        'batching.py',              # Micro-batching of concurrent requests
+        'admission.py',             # Admission control and rate limiting
+        'candidates.py',            # Two-stage candidate pipeline
+        'content.py',               # Content-based cold-start neighbors
+        'serialization.py',         # JSON / MessagePack response encoding
+        'artifacts.py',             # Artifact file helpers
+        'shared_store.py',          # Shared-memory model store
         'requirements.txt',          # Dependencies
         'README.md',                # Project description
-        'Books.csv',                # Book dataset
-        'Users.csv',                # User dataset
-        'Ratings.csv',              # Ratings dataset
         'popular.pkl',              # Popularity model
         'pt.pkl',                   # Pivot table model
-        'books.pkl',                # Books data model
+        'book_meta.npz',            # Slim book metadata
+        'item_factors.npz',         # Matrix factorization item factors
+        'user_index.npz',           # User -> rated books index
+        'candidates.npz',           # Neighbor table and title stats
+        'content_neighbors.npz',    # Content-based neighbors
         'similarity_scores.pkl'     # Similarity matrix
     ]
     
@@ -50,17 +94,46 @@ def create_deployment_package():
         print("\nPlease ensure all required files are present before deployment.")
         return False
     
-    # Create deployment directory
-    deploy_dir = "huggingface_deployment"
-    if os.path.exists(deploy_dir):
-        shutil.rmtree(deploy_dir)
-    os.makedirs(deploy_dir)
+    # Create deployment directory (kept between runs so unchanged files stay put)
+    deploy_dir = DEPLOY_DIR
+    os.makedirs(deploy_dir, exist_ok=True)
     
-    # Copy files to deployment directory
-    print(f"\n📁 Creating deployment directory: {deploy_dir}")
+    # Older runs kept the manifests inside the deployment directory
+    for manifest in (DEPLOY_MANIFEST, UPLOAD_MANIFEST):
+        legacy_path = os.path.join(deploy_dir, manifest)
+        if os.path.exists(legacy_path):
+            if os.path.exists(manifest):
+                os.remove(legacy_path)
+            else:
+                os.replace(legacy_path, manifest)
+    
+    manifest_path = DEPLOY_MANIFEST
+    staged = _read_manifest(manifest_path)
+    uploaded = _read_manifest(UPLOAD_MANIFEST)
+    
+    current = {file: file_hash(file) for file in existing_files}
+    
+    # Copy only the files whose content changed since they were last staged
+    print(f"\n📁 Updating deployment directory: {deploy_dir}")
     for file in existing_files:
-        shutil.copy2(file, deploy_dir)
-        print(f"   - Copied {file}")
+        if staged.get(file) != current[file] or not os.path.exists(os.path.join(deploy_dir, file)):
+            shutil.copy2(file, deploy_dir)
+            print(f"   - Copied {file}")
+        else:
+            print(f"   - Unchanged {file}")
+    
+    # Drop files that are no longer part of the deployment
+    for file in set(staged) - set(current):
+        stale_path = os.path.join(deploy_dir, file)
+        if os.path.exists(stale_path):
+            os.remove(stale_path)
+            print(f"   - Removed {file}")
+    
+    _write_manifest(manifest_path, current)
+    
+    # What an existing Space still needs, compared with the last confirmed upload
+    changed_files = [file for file in existing_files if uploaded.get(file) != current[file]]
+    removed_files = sorted(set(uploaded) - set(current))
     
     # Create deployment instructions
     instructions = """# 🚀 Hugging Face Spaces Deployment Instructions
@@ -79,9 +152,14 @@ def create_deployment_package():
 - **Space hardware**: Choose "CPU" (free tier)
 
 ### 3. Upload Files
-- Choose "Upload files" option
-- Upload ALL files from this deployment package
+- **New Space**: choose "Upload files" and upload ALL files from this
+  deployment package (or from `book-recommender-huggingface.zip`)
+- **Existing Space**: upload only the files in
+  `book-recommender-huggingface-changes.zip` and delete any files the
+  script lists as removed
 - Make sure to include the .pkl files (they're large!)
+- Once the upload is done, run `python deploy_to_huggingface.py --mark-uploaded`
+  so the next run only packages what changed after it
 
 ### 4. Wait for Build
 - Hugging Face will automatically build your Space
@@ -119,32 +197,70 @@ Good luck with your deployment! 🎉
     with open(os.path.join(deploy_dir, "DEPLOYMENT_INSTRUCTIONS.md"), "w", encoding='utf-8') as f:
         f.write(instructions)
     
-    # Create ZIP file for easy upload
-    zip_filename = "book-recommender-huggingface.zip"
-    with zipfile.ZipFile(zip_filename, 'w', zipfile.ZIP_DEFLATED) as zipf:
+    # Full package, for creating a new Space
+    with zipfile.ZipFile(FULL_ZIP, 'w', zipfile.ZIP_DEFLATED) as zipf:
         for file in existing_files:
             zipf.write(file, file)
         zipf.write(os.path.join(deploy_dir, "DEPLOYMENT_INSTRUCTIONS.md"), "DEPLOYMENT_INSTRUCTIONS.md")
-    
-    print(f"\n📦 Created deployment package: {zip_filename}")
+    print(f"\n📦 Created full deployment package with {len(existing_files)} files: {FULL_ZIP}")
     print(f"📁 Deployment files are in: {deploy_dir}/")
     
+    if not changed_files and not removed_files:
+        if os.path.exists(CHANGES_ZIP):
+            os.remove(CHANGES_ZIP)
+        print("\n✅ Nothing changed since the last confirmed upload; an existing Space is up to date.")
+        return True
+    
+    # Delta against the last confirmed upload, for updating an existing Space
+    with zipfile.ZipFile(CHANGES_ZIP, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        for file in changed_files:
+            zipf.write(file, file)
+    
+    if uploaded:
+        print(f"📦 Created {CHANGES_ZIP} with {len(changed_files)} files changed since the last confirmed upload:")
+        for file in changed_files:
+            print(f"   - {file}")
+        for file in removed_files:
+            print(f"   - {file} (removed: delete it from the Space)")
+    else:
+        print(f"📦 No upload has been confirmed yet, so {CHANGES_ZIP} holds every file")
+    
     print("\n" + "=" * 60)
     print("🎯 NEXT STEPS:")
     print("1. Go to https://huggingface.co/spaces")
-    print("2. Create a new Space")
-    print("3. Upload the files from the deployment directory")
-    print("4. Wait for build to complete")
+    print(f"2. New Space: create it and upload the files from {deploy_dir}/ (or {FULL_ZIP})")
+    print(f"   Existing Space: upload the files in {CHANGES_ZIP}")
+    print("3. Wait for build to complete")
+    print("4. Run: python deploy_to_huggingface.py --mark-uploaded")
     print("5. Your API will be live!")
     print("=" * 60)
     
     return True
 
+def mark_uploaded():
+    """Record the staged package as uploaded, so later runs only ship what changed after it"""
+    staged = _read_manifest(DEPLOY_MANIFEST)
+    if not staged:
+        print(f"❌ Nothing staged in {DEPLOY_DIR}/; run the script without --mark-uploaded first")
+        return False
+    _write_manifest(UPLOAD_MANIFEST, staged)
+    print(f"✅ Recorded {len(staged)} files as uploaded")
+    return True
+
 def main():
     """Main deployment preparation function"""
+    parser = argparse.ArgumentParser(description="Prepare the Hugging Face Spaces deployment package")
+    parser.add_argument('--mark-uploaded', action='store_true',
+                        help="Record the last prepared package as uploaded to the Space")
+    args = parser.parse_args()
+
     print("📚 Book Recommender System - Hugging Face Deployment")
     print("=" * 60)
     
+    if args.mark_uploaded:
+        mark_uploaded()
+        return
+    
     success = create_deployment_package()
     
     if success:
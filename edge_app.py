@@ -0,0 +1,81 @@
+"""
+Minimal API served straight from ``model.snapshot`` (see snapshot.py).
+
+Answers /popular, /recommend and /search with the same payloads as app.py
+while only importing Flask (with flask-cors) and NumPy: no pandas, scikit-learn or pickles,
+which keeps the container image small and cold starts fast. /recommend
+serves the default collaborative model (precomputed neighbors, up to
+``snapshot.NEIGHBORS`` per title) with the content-based fallback; the
+filters, diversity re-ranking and other models need the full app.
+
+Usage:
+    MODEL_SNAPSHOT=model.snapshot python edge_app.py
+"""
+
+from flask import Flask, request
+from flask_cors import CORS
+import os
+
+from serialization import CachedResponse, respond
+from snapshot import NEIGHBORS, Snapshot
+
+app = Flask(__name__)
+CORS(app)  # Same cross-origin access as app.py
+
+snapshot = Snapshot(os.environ.get('MODEL_SNAPSHOT', 'model.snapshot'))
+print(f"✅ Loaded snapshot with {len(snapshot.book_meta)} titles")
+
+@app.route('/')
+def home():
+    return respond({
+        "message": "Book Recommender System API (edge)",
+        "status": "running",
+        "endpoints": {
+            "popular_books": "/popular",
+            "recommend_books": "/recommend/<book_name>",
+            "search_books": "/search/<query>",
+            "health": "/health"
+        }
+    })
+
+# The snapshot never changes while the process runs, so encode /popular once
+popular_response = CachedResponse(lambda: snapshot.popular_books()[0])
+
+@app.route('/popular')
+def get_popular_books():
+    """Get top 50 popular books"""
+    try:
+        return popular_response.respond()
+    except Exception as e:
+        return respond({"error": str(e)}), 500
+
+@app.route('/recommend/<path:book_name>')
+def recommend_books(book_name):
+    """Get book recommendations based on a book name"""
+    try:
+        k = min(max(request.args.get('k', 5, type=int), 1), NEIGHBORS)
+        payload, status = snapshot.recommend(book_name, k)
+        return respond(payload), status
+    except Exception as e:
+        return respond({"error": str(e)}), 500
+
+@app.route('/search/<path:query>')
+def search_books(query):
+    """Search for books by title or author"""
+    try:
+        payload, status = snapshot.search(query)
+        return respond(payload), status
+    except Exception as e:
+        return respond({"error": str(e)}), 500
+
+@app.route('/health')
+def health_check():
+    """Health check endpoint for monitoring"""
+    return respond({
+        "status": "healthy",
+        "snapshot": snapshot.info
+    })
+
+if __name__ == '__main__':
+    port = int(os.environ.get('PORT', 7860))
+    app.run(host='0.0.0.0', port=port, debug=False)
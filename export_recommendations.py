@@ -0,0 +1,245 @@
+#!python
+"""
+Export top-k recommendations for every title in the collaborative filtering
+model, for bulk loading into a downstream store.
+
+Neighbors for the whole catalog are computed in one vectorized pass over the
+similarity matrix, then written out in chunks (JSONL or Parquet) by a pool of
+worker processes. Each chunk is written atomically, so an interrupted export
+can be resumed and only the missing chunks are produced again. The export
+parameters and model file hashes are recorded in ``_PARAMS.json`` first,
+and a resume with different parameters (or a changed model) is refused
+unless ``--overwrite`` is given, so one export never mixes chunks built
+differently.
+
+Usage:
+    python export_recommendations.py --k 10 --format jsonl --output-dir exports
+"""
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import pickle
+import time
+
+import numpy as np
+
+from artifacts import file_hash
+from metadata import BookMetadata
+from ranking import top_k_neighbors
+
+PARAMS_FILE = '_PARAMS.json'
+
+# Metadata for the titles in pt.index, shared with the worker processes
+_titles = None
+_authors = None
+_images = None
+
+
+def load_catalog(model_dir='.'):
+    """Load the CF model and the author / image columns aligned to pt.index"""
+    pt = pickle.load(open(os.path.join(model_dir, 'pt.pkl'), 'rb'))
+    book_meta = BookMetadata.load(os.path.join(model_dir, 'book_meta.npz'))
+    similarity_scores = pickle.load(open(os.path.join(model_dir, 'similarity_scores.pkl'), 'rb'))
+
+    titles = pt.index.tolist()
+    records = [
+        book_meta.record(row, ("author", "image_url")) if row >= 0 else {"author": None, "image_url": None}
+        for row in book_meta.rows_of(titles).tolist()
+    ]
+    authors = [r["author"] for r in records]
+    images = [r["image_url"] for r in records]
+    return titles, authors, images, similarity_scores
+
+
+def _init_worker(titles, authors, images):
+    global _titles, _authors, _images
+    _titles, _authors, _images = titles, authors, images
+
+
+def _chunk_path(output_dir, chunk_id, fmt):
+    return os.path.join(output_dir, f"part-{chunk_id:05d}.{fmt}")
+
+
+def export_params(model_dir, k, chunk_size, fmt):
+    """Everything the contents of the chunk files depend on"""
+    return {
+        "k": k,
+        "chunk_size": chunk_size,
+        "format": fmt,
+        **{name: file_hash(os.path.join(model_dir, name))
+           for name in ('pt.pkl', 'similarity_scores.pkl', 'book_meta.npz')},
+    }
+
+
+def _read_params(output_dir):
+    path = os.path.join(output_dir, PARAMS_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _existing_chunks(output_dir):
+    return glob.glob(os.path.join(output_dir, 'part-*'))
+
+
+def _write_chunk(task):
+    """Write one chunk of neighbors; runs in a worker process"""
+    chunk_id, rows, neighbor_idx, neighbor_scores, output_dir, fmt = task
+    path = _chunk_path(output_dir, chunk_id, fmt)
+    tmp_path = path + '.tmp'
+
+    if fmt == 'jsonl':
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for row, idx, scores in zip(rows.tolist(), neighbor_idx.tolist(), neighbor_scores.tolist()):
+                record = {
+                    "title": _titles[row],
+                    "author": _authors[row],
+                    "image_url": _images[row],
+                    "recommendations": [
+                        {
+                            "title": _titles[i],
+                            "author": _authors[i],
+                            "image_url": _images[i],
+                            "similarity_score": score
+                        }
+                        for i, score in zip(idx, scores)
+                    ]
+                }
+                f.write(json.dumps(record, ensure_ascii=False))
+                f.write('\n')
+    else:
+        import pandas as pd
+
+        k = neighbor_idx.shape[1]
+        flat_idx = neighbor_idx.ravel()
+        frame = pd.DataFrame({
+            "title": np.repeat(np.array(_titles, dtype=object)[rows], k),
+            "rank": np.tile(np.arange(1, k + 1), len(rows)),
+            "recommended_title": np.array(_titles, dtype=object)[flat_idx],
+            "recommended_author": np.array(_authors, dtype=object)[flat_idx],
+            "recommended_image_url": np.array(_images, dtype=object)[flat_idx],
+            "similarity_score": neighbor_scores.ravel()
+        })
+        frame.to_parquet(tmp_path, index=False)
+
+    os.replace(tmp_path, path)
+    return chunk_id, len(rows)
+
+
+def export_recommendations(model_dir='.', output_dir='exports', k=5, fmt='jsonl',
+                           chunk_size=1000, workers=None, overwrite=False):
+    """Export top-k recommendations for the full catalog"""
+
+    print("Book Recommender System - Recommendation Export")
+    print("=" * 50)
+
+    if fmt == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("Parquet export requires pyarrow (pip install pyarrow)")
+            return False
+
+    try:
+        start = time.perf_counter()
+        titles, authors, images, similarity_scores = load_catalog(model_dir)
+        n_items = len(titles)
+        print(f"Loaded {n_items} titles from {model_dir}")
+
+        os.makedirs(output_dir, exist_ok=True)
+        params = export_params(model_dir, k, chunk_size, fmt)
+        previous = _read_params(output_dir)
+        if previous != params and _existing_chunks(output_dir):
+            if not overwrite:
+                print(f"{output_dir}/ holds an export with different parameters or an older model:")
+                print(f"   existing: {previous}")
+                print(f"   requested: {params}")
+                print("Rerun with --overwrite to replace it, or pick another --output-dir")
+                return False
+        if overwrite or previous != params:
+            # Start over: drop chunks and markers of any earlier export
+            for path in _existing_chunks(output_dir) + [os.path.join(output_dir, '_SUCCESS')]:
+                if os.path.exists(path):
+                    os.remove(path)
+            with open(os.path.join(output_dir, PARAMS_FILE), 'w', encoding='utf-8') as f:
+                json.dump(params, f, indent=2, sort_keys=True)
+
+        n_chunks = (n_items + chunk_size - 1) // chunk_size
+        pending = [
+            c for c in range(n_chunks)
+            if not os.path.exists(_chunk_path(output_dir, c, fmt))
+        ]
+        if not pending:
+            print(f"All {n_chunks} chunks already exported to {output_dir}/")
+            return True
+        if len(pending) < n_chunks:
+            print(f"Resuming: {n_chunks - len(pending)} of {n_chunks} chunks already exported")
+
+        # One vectorized pass over every row that still needs exporting
+        pending_rows = np.concatenate([
+            np.arange(c * chunk_size, min((c + 1) * chunk_size, n_items)) for c in pending
+        ])
+        neighbor_idx, neighbor_scores = top_k_neighbors(similarity_scores, pending_rows, k)
+        print(f"Computed top-{neighbor_idx.shape[1]} neighbors for {len(pending_rows)} titles")
+
+        tasks = []
+        offset = 0
+        for c in pending:
+            rows = np.arange(c * chunk_size, min((c + 1) * chunk_size, n_items))
+            end = offset + len(rows)
+            tasks.append((c, rows, neighbor_idx[offset:end], neighbor_scores[offset:end], output_dir, fmt))
+            offset = end
+
+        workers = workers or os.cpu_count() or 1
+        with multiprocessing.Pool(min(workers, len(tasks)), initializer=_init_worker,
+                                  initargs=(titles, authors, images)) as pool:
+            for chunk_id, count in pool.imap_unordered(_write_chunk, tasks):
+                print(f"   - Wrote {os.path.basename(_chunk_path(output_dir, chunk_id, fmt))} ({count} titles)")
+
+        with open(os.path.join(output_dir, '_SUCCESS'), 'w', encoding='utf-8') as f:
+            json.dump({"titles": n_items, "chunks": n_chunks, "k": int(neighbor_idx.shape[1]), "format": fmt}, f)
+
+        print(f"Exported {n_items} titles in {time.perf_counter() - start:.1f}s to {output_dir}/")
+        return True
+
+    except Exception as e:
+        print(f"Error exporting recommendations: {str(e)}")
+        import traceback
+        print("Full error details:")
+        traceback.print_exc()
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export top-k recommendations for every title")
+    parser.add_argument('--model-dir', default='.', help="Directory containing the .pkl models")
+    parser.add_argument('--output-dir', default='exports', help="Directory to write chunk files to")
+    parser.add_argument('--k', type=int, default=5, help="Recommendations per title")
+    parser.add_argument('--format', choices=['jsonl', 'parquet'], default='jsonl')
+    parser.add_argument('--chunk-size', type=int, default=1000, help="Titles per output file")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--overwrite', action='store_true', help="Replace an existing export instead of resuming it")
+    args = parser.parse_args()
+
+    return export_recommendations(
+        model_dir=args.model_dir,
+        output_dir=args.output_dir,
+        k=args.k,
+        fmt=args.format,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        overwrite=args.overwrite
+    )
+
+
+if __name__ == "__main__":
+    success = main()
+
+    if success:
+        print("\n✅ Export finished successfully!")
+    else:
+        print("\n❌ Export failed. Please check the error messages above.")
@@ -0,0 +1,90 @@
+"""
+Matrix factorization recommender.
+
+Trains low-rank item factors on the full ratings set with randomized
+truncated SVD (scikit-learn's ``randomized_svd``, multithreaded through
+BLAS). Unlike the item-item cosine model, which only covers titles that
+survive the 200-ratings-per-user / 50-ratings-per-book filter, every title
+with a handful of ratings gets a factor vector. Similar items are scored by
+dot products against the compact factor matrix, so there is no n x n
+similarity matrix to store.
+
+Factor rows are aligned to rows of ``book_meta.npz`` (see metadata.py) so
+titles are looked up through the metadata rather than a separate index.
+"""
+
+import numpy as np
+
+from artifacts import save_npz
+
+
+class FactorModel:
+    """L2-normalized item factors keyed by book metadata row"""
+
+    def __init__(self, factors, meta_rows, n_meta_rows=None):
+        self.factors = factors
+        self.meta_rows = np.asarray(meta_rows, dtype=np.int64)
+        n_meta_rows = n_meta_rows or (int(self.meta_rows.max()) + 1 if len(self.meta_rows) else 0)
+        # Reverse index: metadata row -> factor row (-1 when not covered)
+        self.factor_rows = np.full(n_meta_rows, -1, dtype=np.int64)
+        self.factor_rows[self.meta_rows] = np.arange(len(self.meta_rows))
+
+    def __len__(self):
+        return len(self.meta_rows)
+
+    def save(self, path):
+        save_npz(path, factors=self.factors, meta_rows=self.meta_rows,
+                 n_meta_rows=np.int64(len(self.factor_rows)))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as arrays:
+            return cls(arrays["factors"], arrays["meta_rows"], int(arrays["n_meta_rows"]))
+
+    def factor_row(self, meta_row):
+        """Factor row for a metadata row, or -1 if the title has no factors"""
+        if 0 <= meta_row < len(self.factor_rows):
+            return int(self.factor_rows[meta_row])
+        return -1
+
+
+def build_rating_matrix(ratings_with_name, book_meta, min_item_ratings=5):
+    """Build a sparse item x user matrix from the merged ratings frame.
+
+    Implicit interactions (rating 0) are kept with weight 1 and explicit
+    ratings are weighted ``1 + rating``. Returns the CSR matrix and the
+    metadata row of each matrix row.
+    """
+    from scipy.sparse import csr_matrix
+
+    counts = ratings_with_name.groupby("Book-Title")["Book-Rating"].count()
+    kept_titles = counts.index[counts >= min_item_ratings]
+    ratings = ratings_with_name[ratings_with_name["Book-Title"].isin(kept_titles)]
+
+    item_codes, titles = ratings["Book-Title"].factorize()
+    user_codes, _ = ratings["User-ID"].factorize()
+    values = 1.0 + ratings["Book-Rating"].to_numpy(dtype=np.float32)
+
+    # Duplicate (title, user) pairs from multiple ISBNs are summed
+    matrix = csr_matrix((values, (item_codes, user_codes)),
+                        shape=(len(titles), int(user_codes.max()) + 1), dtype=np.float32)
+    return matrix, book_meta.rows_of(titles)
+
+
+def train_factor_model(ratings_with_name, book_meta, n_factors=64, min_item_ratings=5,
+                       n_iter=5, random_state=42):
+    """Train a FactorModel with randomized truncated SVD"""
+    from sklearn.utils.extmath import randomized_svd
+
+    matrix, meta_rows = build_rating_matrix(ratings_with_name, book_meta, min_item_ratings)
+    n_factors = max(1, min(n_factors, min(matrix.shape) - 1))
+
+    u, s, _ = randomized_svd(matrix, n_components=n_factors, n_iter=n_iter, random_state=random_state)
+    factors = (u * s).astype(np.float32)
+
+    # Normalize so a dot product is the cosine similarity in factor space
+    norms = np.linalg.norm(factors, axis=1, keepdims=True)
+    factors /= np.where(norms > 0, norms, 1)
+
+    keep = meta_rows >= 0
+    return FactorModel(factors[keep], meta_rows[keep], len(book_meta))
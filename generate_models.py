@@ -2,120 +2,304 @@
 """
 Script to generate the pickle files needed for the book recommender system.
 This script replicates the exact logic from Book_recommender.ipynb
+
+Usage:
+    python generate_models.py                        # build the models
+    python generate_models.py --min-user-ratings 150 # with other thresholds
+    python generate_models.py --sweep \\
+        --min-user-ratings 100,200,300 --min-book-ratings 25,50,100 --min-votes 100,250
 """
 
+import argparse
+import json
+import sys
+import time
+
 import numpy as np
 import pandas as pd
 import pickle
 from sklearn.metrics.pairwise import cosine_similarity
 import os
 
-def generate_models():
-    """Generate all the pickle files needed for the recommender system"""
-    
-    print("Book Recommender System - Model Generator")
-    print("=" * 50)
-    print("Loading data...")
-    
+from artifacts import BuildManifest, file_hash
+from candidates import CandidateIndex
+from content import ContentIndex, build_content_index
+from evaluate import evaluate_ratings, rating_matrix
+from factorization import train_factor_model
+from metadata import BookMetadata
+from snapshot import NEIGHBORS as SNAPSHOT_NEIGHBORS, title_trigrams, write_snapshot
+from user_index import UserIndex
+
+# Default thresholds (as in the notebook)
+MIN_USER_RATINGS = 200  # users must have rated more than this many books
+MIN_BOOK_RATINGS = 50   # books need at least this many ratings from those users
+MIN_VOTES = 250         # popular books need at least this many ratings
+
+def read_csv(filename):
+    """Read one of the semicolon separated dataset files"""
+    try:
+        return pd.read_csv(filename, encoding='latin-1', sep=';', on_bad_lines='skip')
+    except:
+        return pd.read_csv(filename, sep=';', on_bad_lines='skip')
+
+def load_data():
+    """Load Books.csv, Users.csv and Ratings.csv (None if any is missing)"""
     # Check if CSV files exist
     required_files = ['Books.csv', 'Users.csv', 'Ratings.csv']
     missing_files = [f for f in required_files if not os.path.exists(f)]
-    
+
     if missing_files:
         print(f"Warning: Missing CSV files: {missing_files}")
         print("Please ensure all CSV files are present in the current directory.")
-        return False
-    
+        return None
+
+    books = read_csv('Books.csv')
+    users = read_csv('Users.csv')
+    ratings = read_csv('Ratings.csv')
+
+    print(f"Loaded {len(books)} books, {len(users)} users, {len(ratings)} ratings")
+
+    # Check column names to debug
+    print(f"Books columns: {list(books.columns)}")
+    print(f"Ratings columns: {list(ratings.columns)}")
+    print(f"Users columns: {list(users.columns)}")
+
+    return books, users, ratings
+
+def merge_ratings(books, ratings):
+    """Join ratings with book titles.
+
+    Returns the merged frame with numeric ratings, and the number of ratings
+    per title (counted before non-numeric ratings are dropped, as in the notebook).
+    """
+    ratings_with_name = ratings.merge(books, on='ISBN')
+
+    # Get number of ratings per book
+    num_rating_df = ratings_with_name.groupby('Book-Title').count()['Book-Rating'].reset_index()
+    num_rating_df.rename(columns={'Book-Rating': 'num_ratings'}, inplace=True)
+
+    # Convert ratings to numeric and handle non-numeric values (as in notebook)
+    ratings_with_name['Book-Rating'] = pd.to_numeric(ratings_with_name['Book-Rating'], errors='coerce')
+    ratings_with_name.dropna(subset=['Book-Rating'], inplace=True)
+
+    return ratings_with_name, num_rating_df
+
+def title_stats(ratings_with_name, num_rating_df):
+    """Number of ratings and average rating per title"""
+    # Get average rating per book
+    avg_rating_df = ratings_with_name.groupby('Book-Title')['Book-Rating'].mean().reset_index()
+    avg_rating_df.rename(columns={'Book-Rating': 'avg_rating'}, inplace=True)
+    return num_rating_df.merge(avg_rating_df, on='Book-Title')
+
+def build_popular(ratings_with_name, num_rating_df, books, min_votes=MIN_VOTES):
+    """Popularity based recommender: top 50 by average rating"""
+    # Merge and filter popular books (min 250 ratings) - exactly as in notebook
+    popular_df = title_stats(ratings_with_name, num_rating_df)
+    popular_df = popular_df[popular_df['num_ratings'] >= min_votes].sort_values('avg_rating', ascending=False).head(50)
+    popular_df = popular_df.merge(books, on='Book-Title').drop_duplicates('Book-Title')[['Book-Title', 'Book-Author', 'Image-URL-M', 'num_ratings', 'avg_rating']]
+    return popular_df
+
+def filter_ratings(ratings_with_name, min_user_ratings=MIN_USER_RATINGS, min_book_ratings=MIN_BOOK_RATINGS):
+    """Keep ratings from heavy users for books they rated often enough"""
+    # Filter users with more than 200 ratings
+    x = ratings_with_name.groupby('User-ID').count()['Book-Rating'] > min_user_ratings
+    padhe_likhe_users = x[x].index
+
+    # Filter ratings for these users
+    filtered_rating = ratings_with_name[ratings_with_name['User-ID'].isin(padhe_likhe_users)]
+
+    # Filter books with more than 50 ratings
+    y = filtered_rating.groupby('Book-Title').count()['Book-Rating'] >= min_book_ratings
+    famous_books = y[y].index
+
+    # Get final ratings
+    return filtered_rating[filtered_rating['Book-Title'].isin(famous_books)]
+
+def build_collaborative(final_ratings):
+    """Collaborative filtering: title x user pivot table and cosine similarities"""
+    # Create pivot table
+    pt = final_ratings.pivot_table(index='Book-Title', columns='User-ID', values='Book-Rating')
+    pt.fillna(0, inplace=True)
+
+    # Calculate similarity scores
+    similarity_scores = cosine_similarity(pt)
+    return pt, similarity_scores
+
+# Build stages: the CSVs each depends on, the code that produces it and its outputs
+STAGES = {
+    "popular": (['Books.csv', 'Ratings.csv'], ['generate_models.py'], ['popular.pkl']),
+    "collaborative": (['Books.csv', 'Ratings.csv'], ['generate_models.py', 'user_index.py', 'candidates.py', 'ranking.py'],
+                      ['pt.pkl', 'similarity_scores.pkl', 'user_index.npz', 'candidates.npz']),
+    "metadata": (['Books.csv'], ['metadata.py'], ['book_meta.npz']),
+    "content": (['Books.csv'], ['metadata.py', 'content.py'], ['content_neighbors.npz']),
+    "factors": (['Books.csv', 'Ratings.csv'], ['generate_models.py', 'metadata.py', 'factorization.py'],
+                ['item_factors.npz']),
+}
+
+# The snapshot is derived from the other artifacts rather than from the CSVs
+SNAPSHOT_FILE = 'model.snapshot'
+SNAPSHOT_INPUTS = ['popular.pkl', 'pt.pkl', 'candidates.npz', 'book_meta.npz', 'content_neighbors.npz']
+
+def save_pickle(obj, path):
+    with open(path, 'wb') as f:
+        pickle.dump(obj, f)
+
+def build_snapshot(manifest, code_dir, force=False):
+    """Write model.snapshot for pandas-free serving if any of its inputs changed"""
+    key = manifest.stage_key({f: file_hash(f) for f in SNAPSHOT_INPUTS}, {"neighbors": SNAPSHOT_NEIGHBORS},
+                             [os.path.join(code_dir, f) for f in ['snapshot.py', 'metadata.py']])
+    if not force and manifest.is_fresh("snapshot", key):
+        print(f"Reusing snapshot (unchanged): {SNAPSHOT_FILE}")
+        return
+
+    print("Writing model snapshot...")
+    with open('popular.pkl', 'rb') as f:
+        popular_df = pickle.load(f)
+    with open('pt.pkl', 'rb') as f:
+        pt = pickle.load(f)
+    book_meta = BookMetadata.load('book_meta.npz')
+    candidate_index = CandidateIndex.load('candidates.npz')
+    content_index = ContentIndex.load('content_neighbors.npz')
+
+    # Neighbor tables are stored as metadata rows, so one row_of() lookup serves everything
+    cf_meta_rows = book_meta.rows_of(pt.index)
+    neighbors = candidate_index.neighbors[:, :SNAPSHOT_NEIGHBORS]
+    popular_rows = book_meta.rows_of(popular_df['Book-Title'])
+    popular_known = popular_rows >= 0
+    trigrams, trigram_offsets, trigram_rows = title_trigrams(book_meta.titles_lower)
+
+    write_snapshot(
+        SNAPSHOT_FILE,
+        arrays={
+            **{name: getattr(book_meta, name) for name in BookMetadata.COLUMNS},
+            "cf_meta_rows": cf_meta_rows,
+            "cf_neighbors": cf_meta_rows[neighbors].astype(np.int32),
+            "cf_scores": candidate_index.neighbor_scores[:, :SNAPSHOT_NEIGHBORS],
+            "content_neighbors": content_index.neighbors,
+            "content_scores": content_index.scores,
+            "popular_rows": popular_rows[popular_known],
+            "popular_num_ratings": popular_df['num_ratings'].to_numpy(dtype=np.int64)[popular_known],
+            "popular_avg_rating": popular_df['avg_rating'].to_numpy(dtype=np.float64)[popular_known],
+            "search_trigrams": trigrams,
+            "search_offsets": trigram_offsets,
+            "search_rows": trigram_rows,
+        },
+        tables={name: getattr(book_meta, name) for name in BookMetadata.TABLES},
+        info={"build_key": key},
+    )
+    manifest.record("snapshot", key, [SNAPSHOT_FILE])
+    print(f"Wrote {SNAPSHOT_FILE} ({os.path.getsize(SNAPSHOT_FILE) / 1e6:.1f} MB)")
+
+def generate_models(min_user_ratings=MIN_USER_RATINGS, min_book_ratings=MIN_BOOK_RATINGS, min_votes=MIN_VOTES,
+                    force=False):
+    """Generate all the pickle files needed for the recommender system.
+
+    Stages whose inputs, parameters and code are unchanged since the last
+    build (per build_manifest.json) and whose outputs are untouched are
+    skipped, unless ``force`` is set.
+    """
+
+    print("Book Recommender System - Model Generator")
+    print("=" * 50)
+
     try:
-        # Load the CSV files with correct separator (semicolon) and encoding
-        try:
-            books = pd.read_csv('Books.csv', encoding='latin-1', sep=';', on_bad_lines='skip')
-        except:
-            books = pd.read_csv('Books.csv', sep=';', on_bad_lines='skip')
-        
-        try:
-            users = pd.read_csv('Users.csv', encoding='latin-1', sep=';', on_bad_lines='skip')
-        except:
-            users = pd.read_csv('Users.csv', sep=';', on_bad_lines='skip')
-            
-        try:
-            ratings = pd.read_csv('Ratings.csv', encoding='latin-1', sep=';', on_bad_lines='skip')
-        except:
-            ratings = pd.read_csv('Ratings.csv', sep=';', on_bad_lines='skip')
-        
-        print(f"Loaded {len(books)} books, {len(users)} users, {len(ratings)} ratings")
-        
-        # Check column names to debug
-        print(f"Books columns: {list(books.columns)}")
-        print(f"Ratings columns: {list(ratings.columns)}")
-        print(f"Users columns: {list(users.columns)}")
-        
-        # Generate Popularity Based Recommender (exactly as in notebook)
-        print("Generating popularity-based recommendations...")
-        ratings_with_name = ratings.merge(books, on='ISBN')
-        
-        # Get number of ratings per book
-        num_rating_df = ratings_with_name.groupby('Book-Title').count()['Book-Rating'].reset_index()
-        num_rating_df.rename(columns={'Book-Rating': 'num_ratings'}, inplace=True)
-        
-        # Convert ratings to numeric and handle non-numeric values (as in notebook)
-        ratings_with_name['Book-Rating'] = pd.to_numeric(ratings_with_name['Book-Rating'], errors='coerce')
-        ratings_with_name.dropna(subset=['Book-Rating'], inplace=True)
-        
-        # Get average rating per book
-        avg_rating_df = ratings_with_name.groupby('Book-Title')['Book-Rating'].mean().reset_index()
-        avg_rating_df.rename(columns={'Book-Rating': 'avg_rating'}, inplace=True)
-        
-        # Merge and filter popular books (min 250 ratings) - exactly as in notebook
-        popular_df = num_rating_df.merge(avg_rating_df, on='Book-Title')
-        popular_df = popular_df[popular_df['num_ratings'] >= 250].sort_values('avg_rating', ascending=False).head(50)
-        popular_df = popular_df.merge(books, on='Book-Title').drop_duplicates('Book-Title')[['Book-Title', 'Book-Author', 'Image-URL-M', 'num_ratings', 'avg_rating']]
-        
-        print(f"Generated popularity recommendations for {len(popular_df)} books")
-        
-        # Generate Collaborative Filtering Based Recommender (exactly as in notebook)
-        print("Generating collaborative filtering recommendations...")
-        
-        # Filter users with more than 200 ratings
-        x = ratings_with_name.groupby('User-ID').count()['Book-Rating'] > 200
-        padhe_likhe_users = x[x].index
-        
-        # Filter ratings for these users
-        filtered_rating = ratings_with_name[ratings_with_name['User-ID'].isin(padhe_likhe_users)]
-        
-        # Filter books with more than 50 ratings
-        y = filtered_rating.groupby('Book-Title').count()['Book-Rating'] >= 50
-        famous_books = y[y].index
-        
-        # Get final ratings
-        final_ratings = filtered_rating[filtered_rating['Book-Title'].isin(famous_books)]
-        
-        # Create pivot table
-        pt = final_ratings.pivot_table(index='Book-Title', columns='User-ID', values='Book-Rating')
-        pt.fillna(0, inplace=True)
-        
-        # Calculate similarity scores
-        similarity_scores = cosine_similarity(pt)
-        
-        print(f"Generated collaborative filtering for {len(pt)} books with {similarity_scores.shape[0]} similarity scores")
-        
-        # Save all models to pickle files (exactly as in notebook)
-        print("Saving models to pickle files...")
-        
-        pickle.dump(popular_df, open('popular.pkl', 'wb'))
-        pickle.dump(pt, open('pt.pkl', 'wb'))
-        pickle.dump(books, open('books.pkl', 'wb'))
-        pickle.dump(similarity_scores, open('similarity_scores.pkl', 'wb'))
-        
+        required_files = ['Books.csv', 'Users.csv', 'Ratings.csv']
+        if any(not os.path.exists(f) for f in required_files):
+            return load_data() is not None  # reports the missing files
+
+        params = {
+            "popular": {"min_votes": min_votes},
+            "collaborative": {"min_user_ratings": min_user_ratings, "min_book_ratings": min_book_ratings},
+            "metadata": {},
+            "content": {},
+            "factors": {},
+        }
+        input_hashes = {f: file_hash(f) for f in ['Books.csv', 'Ratings.csv']}
+        manifest = BuildManifest.load()
+        code_dir = os.path.dirname(os.path.abspath(__file__))
+        keys = {
+            stage: manifest.stage_key({f: input_hashes[f] for f in inputs}, params[stage],
+                                      [os.path.join(code_dir, f) for f in code_files])
+            for stage, (inputs, code_files, _) in STAGES.items()
+        }
+        stale = [stage for stage in STAGES if force or not manifest.is_fresh(stage, keys[stage])]
+        for stage in STAGES:
+            if stage not in stale:
+                print(f"Reusing {stage} outputs (unchanged): {', '.join(STAGES[stage][2])}")
+        if not stale:
+            print("All models are up to date; nothing to rebuild.")
+            build_snapshot(manifest, code_dir, force)
+            manifest.save()
+            return True
+
+        print("Loading data...")
+        books, users, ratings = load_data()
+        ratings_with_name, num_rating_df = merge_ratings(books, ratings)
+
+        if "popular" in stale:
+            # Generate Popularity Based Recommender (exactly as in notebook)
+            print("Generating popularity-based recommendations...")
+            popular_df = build_popular(ratings_with_name, num_rating_df, books, min_votes)
+            save_pickle(popular_df, 'popular.pkl')
+            manifest.record("popular", keys["popular"], STAGES["popular"][2])
+            print(f"Generated popularity recommendations for {len(popular_df)} books")
+
+        if "collaborative" in stale:
+            # Generate Collaborative Filtering Based Recommender (exactly as in notebook)
+            print("Generating collaborative filtering recommendations...")
+            final_ratings = filter_ratings(ratings_with_name, min_user_ratings, min_book_ratings)
+            pt, similarity_scores = build_collaborative(final_ratings)
+            save_pickle(pt, 'pt.pkl')
+            save_pickle(similarity_scores, 'similarity_scores.pkl')
+
+            # CSR user -> rated books index for per-user recommendations
+            user_index = UserIndex.from_ratings(final_ratings, pt)
+            user_index.save('user_index.npz')
+
+            # Top-K neighbor table and rating stats for the two-stage pipeline
+            candidate_index = CandidateIndex.from_model(
+                similarity_scores, pt, title_stats(ratings_with_name, num_rating_df).set_index('Book-Title'))
+            candidate_index.save('candidates.npz')
+            manifest.record("collaborative", keys["collaborative"], STAGES["collaborative"][2])
+            print(f"Generated collaborative filtering for {len(pt)} books with {similarity_scores.shape[0]} similarity scores"
+                  f" and {len(user_index)} user histories")
+
+        if "metadata" in stale:
+            # Serve a slim, deduplicated metadata table instead of the full books frame
+            book_meta = BookMetadata.from_books(books)
+            book_meta.save('book_meta.npz')
+            manifest.record("metadata", keys["metadata"], STAGES["metadata"][2])
+            print(f"Generated book metadata for {len(book_meta)} unique titles")
+        else:
+            book_meta = BookMetadata.load('book_meta.npz')
+
+        if "content" in stale:
+            # Content-based neighbors for titles outside the collaborative model
+            print("Building content-based neighbors...")
+            content_index = build_content_index(book_meta)
+            content_index.save('content_neighbors.npz')
+            manifest.record("content", keys["content"], STAGES["content"][2])
+            print(f"Generated content neighbors for {len(content_index)} titles")
+
+        if "factors" in stale:
+            # Matrix factorization over the full ratings set (not just famous books)
+            print("Training matrix factorization model...")
+            item_factors = train_factor_model(ratings_with_name, book_meta)
+            item_factors.save('item_factors.npz')
+            manifest.record("factors", keys["factors"], STAGES["factors"][2])
+            print(f"Trained item factors for {len(item_factors)} titles")
+
+        build_snapshot(manifest, code_dir, force)
+        manifest.save()
+
         print("All models saved successfully!")
         print("Files created:")
-        print("- popular.pkl")
-        print("- pt.pkl") 
-        print("- books.pkl")
-        print("- similarity_scores.pkl")
-        
+        for stage in stale:
+            for path in STAGES[stage][2]:
+                print(f"- {path}")
+
         return True
-        
+
     except Exception as e:
         print(f"Error generating models: {str(e)}")
         import traceback
@@ -123,10 +307,142 @@ def generate_models():
         traceback.print_exc()
         return False
 
+def sweep_thresholds(min_user_ratings_grid, min_book_ratings_grid, min_votes_grid, k=10, output=None):
+    """Report model size, build time and offline quality across threshold grids.
+
+    The CSVs are parsed, merged and aggregated once; per-user and per-title
+    counts are shared by every grid point, and each point only re-filters
+    integer-coded arrays. The build time is measured on the real
+    ``build_collaborative`` path (dense pivot table and cosine).
+    """
+    print("Book Recommender System - Threshold Sweep")
+    print("=" * 50)
+    print("Loading data...")
+
+    try:
+        data = load_data()
+        if data is None:
+            return False
+        books, users, ratings = data
+        ratings_with_name, num_rating_df = merge_ratings(books, ratings)
+
+        # Shared intermediates: integer codes and per-user / per-title counts
+        title_codes, _ = ratings_with_name['Book-Title'].factorize()
+        user_codes, _ = ratings_with_name['User-ID'].factorize()
+        rating_values = ratings_with_name['Book-Rating'].to_numpy(dtype=np.float64)
+        ratings_per_user = np.bincount(user_codes)
+        row_user_ratings = ratings_per_user[user_codes]
+        n_titles = int(title_codes.max()) + 1
+
+        avg_rating = ratings_with_name.groupby('Book-Title')['Book-Rating'].mean()
+        num_ratings = num_rating_df.set_index('Book-Title')['num_ratings']
+
+        results = []
+        print("\nCollaborative filtering grid:")
+        print(f"{'users>':>7} {'books>=':>8} {'titles':>7} {'users':>7} {'density':>8} {'memory MB':>10} {'build s':>8} {f'hit@{k}':>7} {f'ndcg@{k}':>7} {'coverage':>8}")
+        for min_user_ratings in min_user_ratings_grid:
+            user_mask = row_user_ratings > min_user_ratings
+            ratings_per_title = np.bincount(title_codes[user_mask], minlength=n_titles)
+            for min_book_ratings in min_book_ratings_grid:
+                mask = user_mask & (ratings_per_title[title_codes] >= min_book_ratings)
+                if not mask.any():
+                    print(f"{min_user_ratings:>7} {min_book_ratings:>8}   (no ratings left)")
+                    continue
+                _, title_rows = np.unique(title_codes[mask], return_inverse=True)
+                _, user_rows = np.unique(user_codes[mask], return_inverse=True)
+                matrix = rating_matrix(title_rows, user_rows, rating_values[mask])
+
+                # Time the real build: dense pivot table plus dense cosine similarities
+                final_ratings = ratings_with_name[mask]
+                start = time.perf_counter()
+                build_collaborative(final_ratings)
+                build_seconds = time.perf_counter() - start
+
+                n_rows, n_cols = matrix.shape
+                # What the real pipeline stores: dense pivot table plus n x n similarities
+                memory_mb = (n_rows * n_cols + n_rows * n_rows) * 8 / 1e6
+                metrics = evaluate_ratings(title_codes[mask], user_codes[mask], rating_values[mask], k=k)
+                result = {
+                    "min_user_ratings": min_user_ratings,
+                    "min_book_ratings": min_book_ratings,
+                    "titles": n_rows,
+                    "users": n_cols,
+                    "ratings": int(mask.sum()),
+                    "density": matrix.nnz / (n_rows * n_cols),
+                    "memory_mb": memory_mb,
+                    "build_seconds": build_seconds,
+                    f"hit_rate@{k}": metrics["hit_rate"],
+                    f"ndcg@{k}": metrics["ndcg"],
+                    "coverage": metrics["coverage"]
+                }
+                results.append(result)
+                print(f"{min_user_ratings:>7} {min_book_ratings:>8} {n_rows:>7} {n_cols:>7} "
+                      f"{result['density']:>8.4f} {memory_mb:>10.1f} {build_seconds:>8.2f} "
+                      f"{metrics['hit_rate']:>7.3f} {metrics['ndcg']:>7.3f} {metrics['coverage']:>8.3f}")
+
+        print("\nPopularity grid:")
+        print(f"{'votes>=':>8} {'eligible':>9} {'top-50 min avg':>15}")
+        popular_results = []
+        for min_votes in min_votes_grid:
+            eligible = num_ratings.index[num_ratings >= min_votes]
+            top = avg_rating.reindex(eligible).dropna().nlargest(50)
+            popular_results.append({
+                "min_votes": min_votes,
+                "eligible_titles": len(eligible),
+                "top50_min_avg_rating": float(top.min()) if len(top) else None
+            })
+            min_avg = f"{top.min():.3f}" if len(top) else "-"
+            print(f"{min_votes:>8} {len(eligible):>9} {min_avg:>15}")
+
+        if output:
+            with open(output, 'w', encoding='utf-8') as f:
+                json.dump({"collaborative": results, "popular": popular_results}, f, indent=2)
+            print(f"\nSweep results written to {output}")
+
+        return True
+
+    except Exception as e:
+        print(f"Error running threshold sweep: {str(e)}")
+        import traceback
+        print("Full error details:")
+        traceback.print_exc()
+        return False
+
+def _int_list(value):
+    return [int(v) for v in value.split(',') if v.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the recommender models from the CSV files")
+    parser.add_argument('--sweep', action='store_true',
+                        help="Report shape, density, memory, build time and hit-rate over a threshold grid instead of building")
+    parser.add_argument('--min-user-ratings', type=_int_list, default=[MIN_USER_RATINGS],
+                        help="Users must have more ratings than this (comma separated list with --sweep)")
+    parser.add_argument('--min-book-ratings', type=_int_list, default=[MIN_BOOK_RATINGS],
+                        help="Books need at least this many ratings from those users (list with --sweep)")
+    parser.add_argument('--min-votes', type=_int_list, default=[MIN_VOTES],
+                        help="Minimum ratings for the popularity ranking (list with --sweep)")
+    parser.add_argument('--force', action='store_true', help="Rebuild every stage even if nothing changed")
+    parser.add_argument('--k', type=int, default=10, help="Cutoff for the sweep's hit-rate")
+    parser.add_argument('--output', help="Write sweep results as JSON to this file")
+    args = parser.parse_args()
+
+    if not args.sweep:
+        for option in ('min_user_ratings', 'min_book_ratings', 'min_votes'):
+            if len(getattr(args, option)) != 1:
+                parser.error(f"--{option.replace('_', '-')} takes a single value unless --sweep is given")
+
+    if args.sweep:
+        success = sweep_thresholds(args.min_user_ratings, args.min_book_ratings, args.min_votes,
+                                   k=args.k, output=args.output)
+        print("\n✅ Sweep finished!" if success else "\n❌ Sweep failed. Please check the error messages above.")
+        sys.exit(0 if success else 1)
+    return generate_models(args.min_user_ratings[0], args.min_book_ratings[0], args.min_votes[0],
+                           force=args.force)
+
 if __name__ == "__main__":
-    success = generate_models()
-    
+    success = main()
+
     if success:
         print("\n✅ Models generated successfully! You can now deploy to Railway.")
     else:
-        print("\n❌ Failed to generate models. Please check the error messages above.") 
\ No newline at end of file
+        print("\n❌ Failed to generate models. Please check the error messages above.")
@@ -1,37 +1,78 @@
 import gradio as gr
 import requests
 import json
+import os
+from urllib.parse import quote, urlsplit
+
+from requests.adapters import HTTPAdapter
+
+# Set BOOK_API_URL (e.g. http://localhost:5000, with the API started as
+# PORT=5000 python app.py) to call a separately running Flask API. When it is
+# unset the recommendation engine is imported and queried in-process, with no
+# HTTP hop.
+API_URL = os.environ.get("BOOK_API_URL", "").rstrip("/")
+# Both apps default to 7860 (the Hugging Face port), so a local API needs its own port
+SERVER_PORT = int(os.environ.get("GRADIO_SERVER_PORT", os.environ.get("PORT", 7860)))
+API_TIMEOUT = (3.05, float(os.environ.get("BOOK_API_TIMEOUT", 10)))  # (connect, read) seconds
+CONCURRENCY_LIMIT = int(os.environ.get("GRADIO_CONCURRENCY_LIMIT", 8))
+
+if API_URL:
+    api = urlsplit(API_URL)
+    if api.hostname in ("localhost", "127.0.0.1", "0.0.0.0") and api.port == SERVER_PORT:
+        raise SystemExit(f"BOOK_API_URL points at port {SERVER_PORT}, which the UI itself uses; "
+                         "start the API on another port (e.g. PORT=5000 python app.py)")
+
+    # One pooled session, so clicks reuse keep-alive connections to the API
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=CONCURRENCY_LIMIT)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    recommender = None
+else:
+    import recommender
+    recommender.load_models()
+
+def call_api(path):
+    """GET a path from the remote Flask API and return the decoded JSON"""
+    response = session.get(f"{API_URL}{path}", timeout=API_TIMEOUT,
+                           headers={"Accept": "application/json"})
+    return response.json()
 
-# Your Space will run the Flask app, but Gradio provides a nice interface
 def get_popular_books():
-    """Get popular books from the Flask API"""
+    """Get popular books from the recommendation engine"""
     try:
-        response = requests.get("http://localhost:7860/popular")
-        data = response.json()
+        if recommender is not None:
+            data, _ = recommender.popular_books()
+        else:
+            data = call_api("/popular")
         return json.dumps(data, indent=2)
     except Exception as e:
         return f"Error: API not available - {str(e)}"
 
 def get_recommendations(book_name):
-    """Get book recommendations from the Flask API"""
+    """Get book recommendations from the recommendation engine"""
     if not book_name.strip():
         return "Please enter a book title"
     
     try:
-        response = requests.get(f"http://localhost:7860/recommend/{book_name}")
-        data = response.json()
+        if recommender is not None:
+            data, _ = recommender.recommend(book_name)
+        else:
+            data = call_api(f"/recommend/{quote(book_name, safe='')}")
         return json.dumps(data, indent=2)
     except Exception as e:
         return f"Error: API not available - {str(e)}"
 
 def search_books(query):
-    """Search for books using the Flask API"""
+    """Search for books using the recommendation engine"""
     if not query.strip():
         return "Please enter a search query"
     
     try:
-        response = requests.get(f"http://localhost:7860/search/{query}")
-        data = response.json()
+        if recommender is not None:
+            data, _ = recommender.search(query)
+        else:
+            data = call_api(f"/search/{quote(query, safe='')}")
         return json.dumps(data, indent=2)
     except Exception as e:
         return f"Error: API not available - {str(e)}"
@@ -39,8 +80,11 @@ def search_books(query):
 def check_health():
     """Check API health status"""
     try:
-        response = requests.get("http://localhost:7860/health")
-        data = response.json()
+        if recommender is not None:
+            data = {"status": "healthy", "mode": "in-process",
+                    "models_loaded": recommender.models_loaded()}
+        else:
+            data = call_api("/health")
         return json.dumps(data, indent=2)
     except Exception as e:
         return f"Error: API not available - {str(e)}"
@@ -145,8 +189,11 @@ with gr.Blocks(title="📚 Book Recommender System", theme=gr.themes.Soft()) as
         - `/health` - System health check
         """)
 
+# Bound how many requests run at once; further clicks wait in Gradio's queue
+demo.queue(default_concurrency_limit=CONCURRENCY_LIMIT)
+
 # Launch the interface
 if __name__ == "__main__":
-    demo.launch(server_name="0.0.0.0", server_port=7860)
+    demo.launch(server_name="0.0.0.0", server_port=SERVER_PORT)
 else:
     demo.launch() 
\ No newline at end of file
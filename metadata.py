@@ -0,0 +1,204 @@
+"""
+Compact book metadata for serving.
+
+generate_models.py reduces the raw Books.csv frame to one row per unique
+title and the handful of columns the API returns, and saves it as
+``book_meta.npz``:
+
+- strings are stored as a single UTF-8 buffer plus an offsets array
+  (``StringTable``) instead of millions of Python objects,
+- authors and publishers are dictionary-encoded as integer codes into a
+  table of unique values,
+- years are a small integer column (0 when unknown).
+
+Title lookups use a precomputed sort order and binary search, and substring
+search runs ``bytes.find`` over lowercased buffers, so nothing has to be
+materialized per row at load time.
+"""
+
+import re
+
+import numpy as np
+
+from artifacts import save_npz
+
+SEPARATOR = b"\x00"
+
+
+class StringTable:
+    """An immutable list of strings stored in one UTF-8 buffer.
+
+    Entry ``i`` occupies ``data[offsets[i]:offsets[i + 1] - 1]``; every entry
+    is followed by a NUL byte so substring matches never span two entries.
+    ``data`` can be any bytes-like object supporting ``find`` and slicing,
+    such as ``bytes`` or an ``mmap``, and the entries may be a region of a
+    larger buffer (offsets are positions in ``data``).
+    """
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+
+    @classmethod
+    def from_strings(cls, strings):
+        encoded = [("" if s is None else str(s)).replace("\x00", "").encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) + 1 for e in encoded], out=offsets[1:])
+        data = SEPARATOR.join(encoded) + SEPARATOR if encoded else b""
+        return cls(data, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        start, end = self.offsets[i], self.offsets[i + 1] - 1
+        return bytes(self.data[start:end]).decode("utf-8")
+
+    def get_bytes(self, i):
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1] - 1])
+
+    def find(self, query, limit=None):
+        """Return the indices of entries containing ``query``, in order"""
+        needle = query.encode("utf-8")
+        if not needle or SEPARATOR in needle:
+            return np.empty(0, dtype=np.int64)
+
+        start, end = int(self.offsets[0]), int(self.offsets[-1])
+        if limit is None:
+            # Every match in one regex pass, mapped to entries in one vectorized lookup
+            positions = np.fromiter((m.start() for m in re.compile(re.escape(needle)).finditer(self.data, start, end)),
+                                    dtype=np.int64)
+            return np.unique(np.searchsorted(self.offsets, positions, side="right") - 1).astype(np.int64)
+
+        found = []
+        pos = self.data.find(needle, start, end)
+        while pos != -1:
+            i = int(np.searchsorted(self.offsets, pos, side="right")) - 1
+            found.append(i)
+            if limit is not None and len(found) >= limit:
+                break
+            # Continue from the next entry so each entry is reported once
+            pos = self.data.find(needle, int(self.offsets[i + 1]), end)
+        return np.asarray(found, dtype=np.int64)
+
+    def to_arrays(self, prefix):
+        return {
+            f"{prefix}_data": np.frombuffer(bytes(self.data), dtype=np.uint8),
+            f"{prefix}_offsets": self.offsets,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix):
+        return cls(arrays[f"{prefix}_data"].tobytes(), arrays[f"{prefix}_offsets"])
+
+
+class BookMetadata:
+    """Deduplicated, dictionary-encoded book metadata (one row per title)"""
+
+    TABLES = ("titles", "titles_lower", "authors", "authors_lower", "publishers", "image_urls")
+    COLUMNS = ("author_codes", "publisher_codes", "years", "title_order")
+
+    def __init__(self, titles, titles_lower, authors, authors_lower, publishers, image_urls,
+                 author_codes, publisher_codes, years, title_order):
+        self.titles = titles
+        self.titles_lower = titles_lower
+        self.authors = authors
+        self.authors_lower = authors_lower
+        self.publishers = publishers
+        self.image_urls = image_urls
+        self.author_codes = author_codes
+        self.publisher_codes = publisher_codes
+        self.years = years
+        self.title_order = title_order
+        self._publishers_lower = None
+
+    def __len__(self):
+        return len(self.titles)
+
+    @classmethod
+    def from_books(cls, books):
+        """Build the metadata from the raw Books.csv DataFrame"""
+        import pandas as pd
+
+        books = books.dropna(subset=["Book-Title"]).drop_duplicates("Book-Title")
+        titles = books["Book-Title"].astype(str).tolist()
+
+        author_codes, authors = pd.factorize(books["Book-Author"].fillna(""))
+        publisher_codes, publishers = pd.factorize(books["Publisher"].fillna(""))
+        years = pd.to_numeric(books["Year-Of-Publication"], errors="coerce").fillna(0)
+        years = years.clip(0, np.iinfo(np.int16).max).astype(np.int16).to_numpy()
+
+        title_bytes = [t.replace("\x00", "").encode("utf-8") for t in titles]
+        title_order = np.array(sorted(range(len(title_bytes)), key=title_bytes.__getitem__), dtype=np.int64)
+
+        return cls(
+            titles=StringTable.from_strings(titles),
+            titles_lower=StringTable.from_strings(t.lower() for t in titles),
+            authors=StringTable.from_strings(authors),
+            authors_lower=StringTable.from_strings(a.lower() for a in authors),
+            publishers=StringTable.from_strings(publishers),
+            image_urls=StringTable.from_strings(books["Image-URL-M"].fillna("").tolist()),
+            author_codes=author_codes.astype(np.int32),
+            publisher_codes=publisher_codes.astype(np.int32),
+            years=years,
+            title_order=title_order,
+        )
+
+    def save(self, path):
+        arrays = {}
+        for name in self.TABLES:
+            arrays.update(getattr(self, name).to_arrays(name))
+        for name in self.COLUMNS:
+            arrays[name] = getattr(self, name)
+        save_npz(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as arrays:
+            kwargs = {name: StringTable.from_arrays(arrays, name) for name in cls.TABLES}
+            kwargs.update({name: arrays[name] for name in cls.COLUMNS})
+        return cls(**kwargs)
+
+    def row_of(self, title):
+        """Return the row for an exact title, or -1 if it is unknown"""
+        needle = title.encode("utf-8")
+        lo, hi = 0, len(self.title_order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.titles.get_bytes(self.title_order[mid]) < needle:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self.title_order) and self.titles.get_bytes(self.title_order[lo]) == needle:
+            return int(self.title_order[lo])
+        return -1
+
+    def rows_of(self, titles):
+        """Look up several titles at once (-1 for unknown titles)"""
+        return np.array([self.row_of(t) for t in titles], dtype=np.int64)
+
+    def record(self, row, fields=("title", "author", "image_url", "publisher", "year")):
+        """Decode one row into a payload dict (empty values become None)"""
+        values = {
+            "title": self.titles[row],
+            "author": self.authors[self.author_codes[row]] or None,
+            "image_url": self.image_urls[row] or None,
+            "publisher": self.publishers[self.publisher_codes[row]] or None,
+            "year": int(self.years[row]) or None,
+        }
+        return {field: values[field] for field in fields}
+
+    def publisher_codes_matching(self, name):
+        """Codes of the publishers whose name contains ``name`` (case-insensitive)"""
+        if self._publishers_lower is None:
+            self._publishers_lower = StringTable.from_strings(
+                self.publishers[i].lower() for i in range(len(self.publishers)))
+        return self._publishers_lower.find(name.lower())
+
+    def search(self, query, limit=20):
+        """Rows whose title or author contains ``query`` (case-insensitive)"""
+        query_lower = query.lower()
+        title_rows = self.titles_lower.find(query_lower, limit=limit)
+        author_matches = self.authors_lower.find(query_lower)
+        author_rows = np.flatnonzero(np.isin(self.author_codes, author_matches))
+        return np.union1d(title_rows, author_rows)[:limit]
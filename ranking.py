@@ -0,0 +1,106 @@
+"""
+Filtering and re-ranking of recommendation candidates.
+
+Filters are vectorized masks over integer-coded attribute columns (author
+code, publisher code, year) aligned to the candidate set, so restricting a
+similarity row never goes through a DataFrame query. Diversity re-ranking is
+Maximal Marginal Relevance (MMR) over a small pool of the best candidates.
+``top_k_neighbors`` ranks whole similarity rows at once; it is shared by the
+API, the bulk export and the candidate table built with the models.
+"""
+
+import numpy as np
+
+
+def candidate_attributes(book_meta, meta_rows):
+    """Gather integer-coded attribute columns for candidates.
+
+    ``meta_rows`` are book metadata rows (-1 for unknown titles, which get
+    author / publisher code -1 and year 0).
+    """
+    meta_rows = np.asarray(meta_rows, dtype=np.int64)
+    known = meta_rows >= 0
+    safe_rows = np.where(known, meta_rows, 0)
+    return {
+        "known": known,
+        "author_codes": np.where(known, book_meta.author_codes[safe_rows], -1),
+        "publisher_codes": np.where(known, book_meta.publisher_codes[safe_rows], -1),
+        "years": np.where(known, book_meta.years[safe_rows], 0),
+    }
+
+
+def filter_mask(attributes, exclude_author_code=None, min_year=None, max_year=None,
+                publisher_codes=None):
+    """Boolean mask of the candidates that pass every given filter"""
+    mask = attributes["known"].copy()
+    if exclude_author_code is not None:
+        mask &= attributes["author_codes"] != exclude_author_code
+    if min_year is not None:
+        mask &= attributes["years"] >= min_year
+    if max_year is not None:
+        # Unknown years (0) never satisfy a year restriction
+        mask &= (attributes["years"] <= max_year) & (attributes["years"] > 0)
+    if publisher_codes is not None:
+        mask &= np.isin(attributes["publisher_codes"], publisher_codes)
+    return mask
+
+
+def top_k(scores, k):
+    """Indices of the k highest finite scores, best first"""
+    k = max(0, min(k, int(np.isfinite(scores).sum())))
+    if k == 0:
+        return np.empty(0, dtype=np.intp)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+def top_k_neighbors(similarity_scores, rows, k=5):
+    """Return the k most similar items for each row, best first.
+
+    ``rows`` may be a single row index or an array of them. The query item
+    itself is always excluded. Returns ``(indices, scores)`` arrays of shape
+    ``(len(rows), k)``.
+    """
+    rows = np.atleast_1d(np.asarray(rows, dtype=np.intp))
+    # Fancy indexing copies, so masking the query item below is safe
+    scores = np.asarray(similarity_scores[rows], dtype=np.float64)
+    scores[np.arange(len(rows)), rows] = -np.inf
+
+    k = max(0, min(k, scores.shape[1] - 1))
+    if k == 0:
+        empty = np.empty((len(rows), 0))
+        return empty.astype(np.intp), empty
+
+    candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind="stable")
+    return (np.take_along_axis(candidates, order, axis=1),
+            np.take_along_axis(candidate_scores, order, axis=1))
+
+
+def mmr(scores, pairwise, k, diversity, pool_size=None):
+    """Re-rank the best candidates with Maximal Marginal Relevance.
+
+    ``pairwise(indices)`` must return the similarity matrix between the given
+    candidates. ``diversity`` in [0, 1] trades relevance (0) for novelty (1).
+    Only the top ``pool_size`` candidates (default ``10 * k``) are considered.
+    """
+    pool = top_k(scores, pool_size or 10 * k)
+    if len(pool) <= 1 or diversity <= 0:
+        return pool[:k]
+
+    relevance = scores[pool]
+    similarity = np.asarray(pairwise(pool), dtype=np.float64)
+    max_similarity = np.full(len(pool), -np.inf)
+    available = np.ones(len(pool), dtype=bool)
+
+    selected = []
+    for _ in range(min(k, len(pool))):
+        redundancy = np.where(np.isfinite(max_similarity), max_similarity, 0.0)
+        marginal = (1 - diversity) * relevance - diversity * redundancy
+        marginal[~available] = -np.inf
+        best = int(np.argmax(marginal))
+        selected.append(best)
+        available[best] = False
+        max_similarity = np.maximum(max_similarity, similarity[best])
+    return pool[selected]
@@ -0,0 +1,494 @@
+"""
+Recommendation engine for the Book Recommender System.
+
+Holds the loaded models and answers popular / recommend / search queries as
+plain Python payloads. Both the Flask API (app.py) and the Gradio interface
+(gradio_app.py) call into this module, so the UI does not need an HTTP hop.
+
+Query functions return a ``(payload, status)`` tuple, where ``status`` is the
+HTTP status code the API should answer with.
+"""
+
+import os
+import pickle
+import threading
+import time
+
+import numpy as np
+
+from batching import MicroBatcher
+from candidates import CandidateIndex, generate_candidates, score_candidates
+from content import ContentIndex
+from factorization import FactorModel
+from metadata import BookMetadata
+from ranking import candidate_attributes, filter_mask, mmr, top_k, top_k_neighbors
+from serialization import columns_to_records
+import shared_store
+from user_index import UserIndex
+
+# Model artifacts by name, in warm-up order (cheapest first)
+ARTIFACTS = {
+    "popular_df": "popular.pkl",
+    "pt": "pt.pkl",
+    "similarity_scores": "similarity_scores.pkl",
+    "book_meta": "book_meta.npz",
+    "item_factors": "item_factors.npz",
+    "user_index": "user_index.npz",
+    "candidates": "candidates.npz",
+    "content": "content_neighbors.npz",
+}
+
+# Artifacts with a dedicated loader; everything else is a pickle
+LOADERS = {
+    "book_meta": BookMetadata.load,
+    "item_factors": FactorModel.load,
+    "user_index": UserIndex.load,
+    "candidates": CandidateIndex.load,
+    "content": ContentIndex.load,
+}
+
+# Artifacts the API can run without (their endpoints answer 500 instead)
+OPTIONAL_ARTIFACTS = {"item_factors", "user_index", "candidates", "content"}
+
+# Models accepted by recommend(): item-item cosine over the pivot table, dot
+# products over the matrix factorization item factors, or a two-stage pipeline
+# re-scoring a few hundred candidates (see candidates.py)
+MODELS = ("cf", "factors", "two_stage")
+
+# How often, in seconds, workers check the shared store for a new version
+VERSION_CHECK_INTERVAL = 1.0
+
+# Seconds before an artifact that failed to load is tried again
+LOAD_RETRY_INTERVAL = 60.0
+
+# Optional micro-batching of concurrent unfiltered "cf" recommendations (see
+# batching.py), enabled by setting RECOMMEND_BATCH_WINDOW_MS. Off by default:
+# at the current catalog size one row's top-k is cheaper than coordinating a
+# batch. A window of 0 only batches calls queued behind a running batch.
+_window_ms = os.environ.get("RECOMMEND_BATCH_WINDOW_MS")
+BATCH_WINDOW = float(_window_ms) / 1000 if _window_ms else None
+BATCH_SIZE = int(os.environ.get("RECOMMEND_BATCH_SIZE", 32))
+
+
+class ModelStore:
+    """Loads model artifacts lazily, on first use or from a warm-up thread.
+
+    Each artifact has its own lock and status (``pending``, ``loading``,
+    ``ready``, ``missing`` or ``error``), so cheap endpoints never wait on
+    artifacts they do not use and readiness can be reported per artifact.
+    A missing artifact is not retried; one that failed to load is retried at
+    most every ``LOAD_RETRY_INTERVAL`` seconds, so a corrupt file is not
+    re-read on every request.
+
+    With a ``shared`` descriptor (see shared_store.py) artifacts are attached
+    as memory-mapped views of a published version instead of being unpickled.
+    """
+
+    def __init__(self, model_dir='.', shared=None):
+        self.model_dir = model_dir
+        self.shared = shared
+        self.version = shared["version"] if shared else None
+        self._values = {}
+        self._status = {name: "pending" for name in ARTIFACTS}
+        self._locks = {name: threading.Lock() for name in ARTIFACTS}
+        self._failed_at = {}
+        self._warmup_thread = None
+        self._derived = {}
+        self._derived_lock = threading.Lock()
+
+    def get(self, name):
+        """Return an artifact, loading it now if needed (None if unavailable)"""
+        if self._status[name] == "ready":
+            return self._values[name]
+        if self._status[name] in ("missing", "error") and not self._should_load(name):
+            return None
+
+        # Waits here while another thread is loading the artifact
+        with self._locks[name]:
+            if self._should_load(name):
+                self._load(name)
+        return self._values.get(name)
+
+    def _should_load(self, name):
+        status = self._status[name]
+        return status == "pending" or (
+            status == "error" and time.monotonic() - self._failed_at[name] >= LOAD_RETRY_INTERVAL)
+
+    def _load(self, name):
+        self._status[name] = "loading"
+        path = os.path.join(self.model_dir, ARTIFACTS[name])
+        try:
+            if self.shared is not None:
+                self._values[name] = shared_store.attach(self.shared, name)
+            elif name in LOADERS:
+                self._values[name] = LOADERS[name](path)
+            else:
+                with open(path, 'rb') as f:
+                    self._values[name] = pickle.load(f)
+            self._status[name] = "ready"
+            print(f"✅ Loaded {ARTIFACTS[name]}")
+        except FileNotFoundError as e:
+            self._status[name] = "missing"
+            print(f"❌ Model file not found: {e}")
+        except Exception as e:
+            self._status[name] = "error"
+            self._failed_at[name] = time.monotonic()
+            print(f"❌ Failed to load {ARTIFACTS[name]}: {e}")
+
+    def derived(self, key, build):
+        """Return a value computed once from loaded artifacts, building it if needed"""
+        value = self._derived.get(key)
+        if value is None:
+            with self._derived_lock:
+                value = self._derived.get(key)
+                if value is None:
+                    value = self._derived[key] = build()
+        return value
+
+    def status(self):
+        """Per-artifact load status"""
+        return dict(self._status)
+
+    def ready(self):
+        return all(
+            status == "ready" or (name in OPTIONAL_ARTIFACTS and status == "missing")
+            for name, status in self._status.items()
+        )
+
+    def warm_up(self, background=True):
+        """Load every artifact, in a daemon thread unless ``background`` is False"""
+        def load_all():
+            for name in ARTIFACTS:
+                self.get(name)
+            if self.ready():
+                print("✅ All models loaded successfully!")
+
+        if not background:
+            load_all()
+        elif self._warmup_thread is None:
+            self._warmup_thread = threading.Thread(target=load_all, name="model-warmup", daemon=True)
+            self._warmup_thread.start()
+
+
+store = ModelStore()
+
+# Descriptor of the shared model store, when serving from one (MODEL_STORE)
+_shared_descriptor = None
+_version_lock = threading.Lock()
+_last_version_check = 0.0
+
+
+def load_models(model_dir='.', background=None):
+    """Point the store at ``model_dir`` and start warming it up.
+
+    Warm-up runs in a background thread unless ``background`` is False, or
+    MODEL_WARMUP=0 is set, in which case artifacts load on first use only.
+    If MODEL_STORE names a shared store descriptor, artifacts are attached
+    from the published version instead of loaded from ``model_dir``.
+    """
+    global store, _shared_descriptor
+    _shared_descriptor = os.environ.get("MODEL_STORE") or None
+    if _shared_descriptor:
+        shared = shared_store.read_descriptor(_shared_descriptor)
+        if shared["version"] != store.version:
+            store = ModelStore(model_dir, shared)
+            print(f"✅ Attached to shared model store version {shared['version']}")
+    elif model_dir != store.model_dir or store.shared is not None:
+        store = ModelStore(model_dir)
+    if background is None:
+        if os.environ.get("MODEL_WARMUP", "1") == "0":
+            return
+        background = True
+    store.warm_up(background)
+
+
+def current_store():
+    """Return the live model store.
+
+    When serving from a shared store, a newly published version is picked up
+    here (checked at most every VERSION_CHECK_INTERVAL seconds). Callers keep
+    the returned store for the whole request, so one request never mixes
+    artifacts from two versions.
+    """
+    global store, _last_version_check
+    if _shared_descriptor is None or time.monotonic() - _last_version_check < VERSION_CHECK_INTERVAL:
+        return store
+
+    with _version_lock:
+        if time.monotonic() - _last_version_check >= VERSION_CHECK_INTERVAL:
+            _last_version_check = time.monotonic()
+            try:
+                shared = shared_store.read_descriptor(_shared_descriptor)
+                if shared["version"] != store.version:
+                    store = ModelStore(store.model_dir, shared)
+                    print(f"🔄 Switched to model version {shared['version']}")
+                    if os.environ.get("MODEL_WARMUP", "1") != "0":
+                        store.warm_up()
+            except Exception as e:
+                print(f"❌ Failed to read shared model store: {e}")
+    return store
+
+
+def models_loaded():
+    """Report which models are available"""
+    return {name: status == "ready" for name, status in current_store().status().items()}
+
+
+def model_status():
+    """Report the load status of every model artifact"""
+    return current_store().status()
+
+
+def batched_neighbors(similarity_scores, keys):
+    """Top-k neighbors for a batch of ``(row, k)`` keys in one pass.
+
+    The rows are gathered together and ranked with a single batched
+    argpartition for the largest k. Returns ``(indices, scores)`` per key.
+    """
+    rows = [row for row, _ in keys]
+    indices, scores = top_k_neighbors(similarity_scores, rows, max(k for _, k in keys))
+
+    results = []
+    for i, (_, k) in enumerate(keys):
+        keep = np.isfinite(scores[i, :k])
+        results.append((indices[i, :k][keep], scores[i, :k][keep]))
+    return results
+
+
+def popular_books():
+    """Get top 50 popular books"""
+    models = current_store()
+    popular_df = models.get("popular_df")
+    if popular_df is None:
+        return {"error": "Model not loaded"}, 500
+
+    popular = columns_to_records(
+        ["title", "author", "image_url", "num_ratings", "avg_rating"],
+        [popular_df['Book-Title'], popular_df['Book-Author'], popular_df['Image-URL-M'],
+         popular_df['num_ratings'].to_numpy(), popular_df['avg_rating'].to_numpy()]
+    )
+    return {
+        "message": "Top 50 Popular Books",
+        "count": len(popular),
+        "books": popular
+    }, 200
+
+
+def recommend(book_name, k=5, model="cf", exclude_same_author=False, min_year=None,
+              max_year=None, publisher=None, diversity=0.0):
+    """Get book recommendations based on a book name.
+
+    Candidates can be filtered by author, publication year range and
+    publisher, and re-ranked for diversity with MMR (``diversity`` in [0, 1]).
+    Catalog titles the model does not cover get content-based neighbors
+    backfilled with popular books instead of a 404 (see cold_start()).
+    """
+    models = current_store()
+    if model not in MODELS:
+        return {"error": f"Unknown model '{model}', expected one of {list(MODELS)}"}, 400
+    if not 0.0 <= diversity <= 1.0:
+        return {"error": "diversity must be between 0 and 1"}, 400
+
+    filters = {"exclude_same_author": exclude_same_author, "min_year": min_year,
+               "max_year": max_year, "publisher": publisher}
+    filtered = exclude_same_author or min_year is not None or max_year is not None or publisher
+    book_meta = models.get("book_meta")
+    if model == "factors":
+        item_factors = models.get("item_factors")
+        if book_meta is None or item_factors is None:
+            return {"error": "Model not loaded"}, 500
+
+        meta_row = book_meta.row_of(book_name)
+        index = item_factors.factor_row(meta_row)
+        if index < 0:
+            return cold_start(models, book_meta, book_name, k, model, **filters)
+
+        factors = item_factors.factors
+        scores = (factors @ factors[index]).astype(np.float64)
+        scores[index] = -np.inf
+        candidate_rows = item_factors.meta_rows
+        pairwise = lambda idx: factors[idx] @ factors[idx].T
+    else:
+        pt = models.get("pt")
+        similarity_scores = models.get("similarity_scores")
+        if pt is None or book_meta is None or similarity_scores is None:
+            return {"error": "Model not loaded"}, 500
+
+        # Titles outside the collaborative model fall back to content neighbors
+        if book_name not in pt.index:
+            return cold_start(models, book_meta, book_name, k, model, **filters)
+
+        index = pt.index.get_loc(book_name)
+        cf_rows = models.derived("cf_meta_rows", lambda: book_meta.rows_of(pt.index))
+        meta_row = cf_rows[index]
+
+        if model == "two_stage":
+            candidate_index = models.get("candidates")
+            popular_df = models.get("popular_df")
+            if candidate_index is None or popular_df is None:
+                return {"error": "Model not loaded"}, 500
+
+            context = {
+                "candidate_index": candidate_index,
+                "similarity_scores": similarity_scores,
+                "author_codes": models.derived(
+                    "cf_attributes", lambda: candidate_attributes(book_meta, cf_rows))["author_codes"],
+                "popular_rows": models.derived("popular_pt_rows", lambda: _pt_rows(pt, popular_df)),
+            }
+            items = generate_candidates(index, **context)
+            scores = score_candidates(index, items, **context)
+            candidate_rows = cf_rows[items]
+            pairwise = lambda idx: similarity_scores[np.ix_(items[idx], items[idx])]
+        else:
+            if BATCH_WINDOW is not None and not filtered and diversity <= 0:
+                batcher = models.derived("cf_batcher", lambda: MicroBatcher(
+                    lambda keys: batched_neighbors(similarity_scores, keys), BATCH_WINDOW, BATCH_SIZE))
+                top, top_scores = batcher.submit((index, k))
+                return _recommendations(book_name, model, book_meta, cf_rows[top], top_scores), 200
+
+            scores = np.array(similarity_scores[index], dtype=np.float64)
+            scores[index] = -np.inf
+            candidate_rows = cf_rows
+            pairwise = lambda idx: similarity_scores[np.ix_(idx, idx)]
+
+    if filtered:
+        if model == "two_stage":
+            attributes = candidate_attributes(book_meta, candidate_rows)
+        else:
+            attributes = models.derived(f"{model}_attributes",
+                                       lambda: candidate_attributes(book_meta, candidate_rows))
+        scores[~_filter_mask(book_meta, attributes, meta_row, **filters)] = -np.inf
+
+    top = mmr(scores, pairwise, k, diversity) if diversity > 0 else top_k(scores, k)
+    score_key = "score" if model == "two_stage" else "similarity_score"
+    return _recommendations(book_name, model, book_meta, candidate_rows[top], scores[top], score_key), 200
+
+
+def cold_start(models, book_meta, book_name, k=5, model="cf", **filters):
+    """Recommendations for a catalog title the chosen model does not cover.
+
+    Serves the title's precomputed content neighbors (same author, publisher
+    and title words, see content.py), backfilled with the popular list.
+    Titles that are not in the catalog at all still get a 404.
+    """
+    content_index = models.get("content")
+    popular_df = models.get("popular_df")
+    meta_row = book_meta.row_of(book_name)
+    if meta_row < 0 or (content_index is None and popular_df is None):
+        return {"error": f"Book '{book_name}' not found in dataset"}, 404
+
+    rows, scores = (content_index.similar(meta_row) if content_index is not None
+                    else (np.empty(0, dtype=np.int64), np.empty(0)))
+    n_content = len(rows)
+    if popular_df is not None:
+        popular_rows = models.derived("popular_meta_rows", lambda: book_meta.rows_of(popular_df['Book-Title']))
+        backfill = popular_rows[(popular_rows >= 0) & (popular_rows != meta_row) & ~np.isin(popular_rows, rows)]
+        rows = np.concatenate([rows, backfill])
+        scores = np.concatenate([scores, np.zeros(len(backfill))])
+
+    keep = _filter_mask(book_meta, candidate_attributes(book_meta, rows), meta_row, **filters)
+    sources = np.where(np.arange(len(rows)) < n_content, "content", "popular")[keep][:k]
+    payload = _recommendations(book_name, model, book_meta, rows[keep][:k], scores[keep][:k])
+    for recommendation, source in zip(payload["recommendations"], sources.tolist()):
+        recommendation["source"] = source
+    payload["fallback"] = "content"
+    return payload, 200
+
+
+def _filter_mask(book_meta, attributes, meta_row, exclude_same_author=False, min_year=None,
+                 max_year=None, publisher=None):
+    """Apply the recommend() filters to candidate attributes"""
+    return filter_mask(
+        attributes,
+        exclude_author_code=book_meta.author_codes[meta_row] if exclude_same_author and meta_row >= 0 else None,
+        min_year=min_year,
+        max_year=max_year,
+        publisher_codes=book_meta.publisher_codes_matching(publisher) if publisher else None
+    )
+
+
+def _pt_rows(pt, popular_df):
+    """Rows of ``pt`` for the popular titles, most popular first"""
+    rows = pt.index.get_indexer(popular_df['Book-Title'])
+    return rows[rows >= 0]
+
+
+def _recommendations(book_name, model, book_meta, meta_rows, scores, score_key="similarity_score"):
+    """Build the recommend() payload from ranked metadata rows and scores"""
+    recommendations = []
+    for row, score in zip(meta_rows.tolist(), scores.tolist()):
+        if row >= 0:
+            recommendation = book_meta.record(row, ("title", "author", "image_url"))
+            recommendation[score_key] = score
+            recommendations.append(recommendation)
+
+    return {
+        "message": f"Recommendations for '{book_name}'",
+        "input_book": book_name,
+        "model": model,
+        "recommendations": recommendations
+    }
+
+
+def score_user_items(similarity_scores, item_rows, ratings):
+    """Score every item for a user from the items they have rated.
+
+    Each candidate's score is the rating-weighted mean of its similarity to
+    the user's rated items (implicit 0 ratings count with weight 1). Items the
+    user has already rated are masked with -inf.
+    """
+    weights = 1.0 + np.asarray(ratings, dtype=np.float64)
+    scores = weights @ similarity_scores[item_rows] / weights.sum()
+    scores[item_rows] = -np.inf
+    return scores
+
+
+def recommend_for_user(user_id, k=5):
+    """Get book recommendations from a user's ratings history"""
+    models = current_store()
+    pt = models.get("pt")
+    similarity_scores = models.get("similarity_scores")
+    book_meta = models.get("book_meta")
+    user_index = models.get("user_index")
+    if pt is None or similarity_scores is None or book_meta is None or user_index is None:
+        return {"error": "Model not loaded"}, 500
+
+    history = user_index.items_of(user_id)
+    if history is None:
+        return {"error": f"User '{user_id}' not found in dataset"}, 404
+
+    item_rows, ratings = history
+    scores = score_user_items(similarity_scores, item_rows, ratings)
+
+    top = top_k(scores, k)
+
+    recommendations = []
+    rows = book_meta.rows_of(pt.index[top])
+    for row, score in zip(rows.tolist(), scores[top].tolist()):
+        if row >= 0:
+            recommendation = book_meta.record(row, ("title", "author", "image_url"))
+            recommendation["score"] = score
+            recommendations.append(recommendation)
+
+    return {
+        "message": f"Recommendations for user {user_id}",
+        "user_id": user_id,
+        "books_rated": len(item_rows),
+        "recommendations": recommendations
+    }, 200
+
+
+def search(query, limit=20):
+    """Search for books by title or author"""
+    models = current_store()
+    book_meta = models.get("book_meta")
+    if book_meta is None:
+        return {"error": "Model not loaded"}, 500
+
+    results = [book_meta.record(row) for row in book_meta.search(query, limit).tolist()]
+    return {
+        "message": f"Search results for '{query}'",
+        "query": query,
+        "count": len(results),
+        "books": results
+    }, 200
@@ -0,0 +1,125 @@
+"""
+Response serialization helpers for the Book Recommender API.
+
+Responses are encoded with orjson (including its native NumPy support) when it
+is installed, and with the standard library json module otherwise. Clients that
+send ``Accept: application/msgpack`` get MessagePack instead of JSON when the
+msgpack package is available.
+"""
+
+import json
+
+import numpy as np
+from flask import Response, request
+
+try:
+    import orjson
+except ImportError:  # optional fast encoder
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional binary format
+    msgpack = None
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+MSGPACK_MIMETYPES = (MSGPACK_MIMETYPE, 'application/x-msgpack')
+
+
+def _default(obj):
+    """Convert NumPy values the encoders do not handle natively"""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+def dumps_json(payload):
+    """Encode a payload as UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(
+            payload,
+            default=_default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+        )
+    return json.dumps(payload, default=_default, ensure_ascii=False,
+                      separators=(',', ':')).encode('utf-8')
+
+
+def dumps_msgpack(payload):
+    """Encode a payload as MessagePack bytes"""
+    return msgpack.packb(payload, default=_default, use_bin_type=True)
+
+
+def columns_to_records(keys, columns):
+    """Zip column buffers (NumPy arrays, Series or lists) into a list of dicts.
+
+    Each column is converted to native Python values in a single ``tolist()``
+    call instead of casting every cell with ``int()`` / ``float()``.
+    """
+    columns = [c.tolist() if hasattr(c, 'tolist') else list(c) for c in columns]
+    return [dict(zip(keys, values)) for values in zip(*columns)]
+
+
+def negotiate_mimetype():
+    """Pick the response format from the request's Accept header"""
+    offered = [JSON_MIMETYPE]
+    if msgpack is not None:
+        offered.extend(MSGPACK_MIMETYPES)
+    best = request.accept_mimetypes.best_match(offered, default=JSON_MIMETYPE)
+    return MSGPACK_MIMETYPE if best in MSGPACK_MIMETYPES else JSON_MIMETYPE
+
+
+def encode(payload, mimetype):
+    """Encode a payload for the given mimetype"""
+    if mimetype == MSGPACK_MIMETYPE:
+        return dumps_msgpack(payload)
+    return dumps_json(payload)
+
+
+def respond(payload, status=200, headers=None):
+    """Build a Flask response in the negotiated format"""
+    mimetype = negotiate_mimetype()
+    response = Response(encode(payload, mimetype), status=status, mimetype=mimetype)
+    response.vary.add('Accept')
+    if headers:
+        response.headers.update(headers)
+    return response
+
+
+class CachedResponse:
+    """Encode a static payload once per format and reuse the bytes.
+
+    Used for responses such as ``/popular`` whose content only changes when the
+    models are reloaded. If ``version`` is given, the cached bytes are dropped
+    whenever the value it returns changes.
+    """
+
+    def __init__(self, build_payload, version=None):
+        self.build_payload = build_payload
+        self.version = version
+        self._version = None
+        self._payload = None
+        self._encoded = {}
+
+    def clear(self):
+        self._payload = None
+        self._encoded = {}
+
+    def respond(self):
+        if self.version is not None:
+            version = self.version()
+            if version != self._version:
+                self.clear()
+                self._version = version
+        mimetype = negotiate_mimetype()
+        body = self._encoded.get(mimetype)
+        if body is None:
+            if self._payload is None:
+                self._payload = self.build_payload()
+            body = self._encoded[mimetype] = encode(self._payload, mimetype)
+        response = Response(body, status=200, mimetype=mimetype)
+        response.vary.add('Accept')
+        return response
@@ -0,0 +1,235 @@
+#!python
+"""
+Shared model store for multi-process serving.
+
+``publish`` loads the model artifacts once and writes their arrays as raw
+files into a version directory under shared memory (``/dev/shm`` when
+available), then atomically points a small JSON descriptor at it. Worker
+processes started with ``MODEL_STORE=<descriptor>`` attach to those files
+with ``mmap``: every worker maps the same physical pages, so the models take
+one copy of RAM per node instead of one per worker.
+
+Publishing a new version writes a new directory and swaps the descriptor;
+workers notice the new version on their next request and re-attach. Old
+versions are pruned, and already-mapped pages stay valid until the workers
+drop them.
+
+Usage:
+    python shared_store.py --model-dir . --store-dir /dev/shm/book-recommender
+    MODEL_STORE=/dev/shm/book-recommender/current.json gunicorn -w 8 app:app
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import shutil
+import tempfile
+import time
+import types
+
+import numpy as np
+
+from artifacts import file_hash
+from candidates import CandidateIndex
+from content import ContentIndex
+from factorization import FactorModel
+from metadata import BookMetadata, StringTable
+from user_index import UserIndex
+
+DEFAULT_STORE_DIR = os.path.join(
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'book-recommender')
+DESCRIPTOR_FILE = 'current.json'
+
+# Artifact files published by the store (popular.pkl is small and stays a pickle)
+SOURCE_FILES = {
+    "popular_df": "popular.pkl",
+    "pt": "pt.pkl",
+    "similarity_scores": "similarity_scores.pkl",
+    "book_meta": "book_meta.npz",
+    "item_factors": "item_factors.npz",
+    "user_index": "user_index.npz",
+    "candidates": "candidates.npz",
+    "content": "content_neighbors.npz",
+}
+
+
+def _write_array(version_dir, name, array):
+    np.save(os.path.join(version_dir, f"{name}.npy"), np.ascontiguousarray(array), allow_pickle=False)
+    return f"{name}.npy"
+
+
+def _write_table(version_dir, name, table):
+    with open(os.path.join(version_dir, f"{name}.bin"), 'wb') as f:
+        f.write(bytes(table.data))
+    return {"data": f"{name}.bin", "offsets": _write_array(version_dir, f"{name}_offsets", table.offsets)}
+
+
+def publish(model_dir='.', store_dir=DEFAULT_STORE_DIR, keep_versions=2):
+    """Publish the artifacts in ``model_dir`` and return the descriptor path"""
+    present = {name: os.path.join(model_dir, f) for name, f in SOURCE_FILES.items()
+               if os.path.exists(os.path.join(model_dir, f))}
+    version = _store_version(present.values())
+    version_dir = os.path.join(store_dir, version)
+    artifacts = {}
+
+    if not os.path.exists(version_dir):
+        staging_dir = tempfile.mkdtemp(prefix=f".{version}-", dir=_ensure_dir(store_dir))
+        for name, path in present.items():
+            if name == "popular_df":
+                shutil.copyfile(path, os.path.join(staging_dir, "popular.pkl"))
+                artifacts[name] = {"pickle": "popular.pkl"}
+            elif name == "pt":
+                # Serving only needs the titles of the pivot table rows
+                pt = _load_pickle(path)
+                artifacts[name] = {"titles": _write_table(staging_dir, "pt_titles",
+                                                          StringTable.from_strings(pt.index.tolist()))}
+            elif name == "similarity_scores":
+                similarity_scores = _load_pickle(path)
+                artifacts[name] = {"array": _write_array(staging_dir, "similarity_scores", similarity_scores)}
+            elif name == "book_meta":
+                book_meta = BookMetadata.load(path)
+                artifacts[name] = {
+                    "tables": {t: _write_table(staging_dir, f"meta_{t}", getattr(book_meta, t))
+                               for t in BookMetadata.TABLES},
+                    "columns": {c: _write_array(staging_dir, f"meta_{c}", getattr(book_meta, c))
+                                for c in BookMetadata.COLUMNS},
+                }
+            elif name == "item_factors":
+                item_factors = FactorModel.load(path)
+                artifacts[name] = {
+                    "factors": _write_array(staging_dir, "factors", item_factors.factors),
+                    "meta_rows": _write_array(staging_dir, "factor_meta_rows", item_factors.meta_rows),
+                    "n_meta_rows": len(item_factors.factor_rows),
+                }
+            elif name == "user_index":
+                user_index = UserIndex.load(path)
+                artifacts[name] = {field: _write_array(staging_dir, f"user_{field}", getattr(user_index, field))
+                                   for field in ("user_ids", "indptr", "item_rows", "ratings")}
+            elif name == "candidates":
+                candidate_index = CandidateIndex.load(path)
+                artifacts[name] = {field: _write_array(staging_dir, f"candidates_{field}", getattr(candidate_index, field))
+                                   for field in ("neighbors", "neighbor_scores", "num_ratings", "avg_rating")}
+            elif name == "content":
+                content_index = ContentIndex.load(path)
+                artifacts[name] = {field: _write_array(staging_dir, f"content_{field}", getattr(content_index, field))
+                                   for field in ("neighbors", "scores")}
+
+        with open(os.path.join(staging_dir, "artifacts.json"), 'w', encoding='utf-8') as f:
+            json.dump(artifacts, f, indent=2)
+        os.replace(staging_dir, version_dir)
+
+    descriptor = {"version": version, "path": version_dir, "published_at": time.time()}
+    descriptor_path = os.path.join(store_dir, DESCRIPTOR_FILE)
+    tmp_path = descriptor_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(descriptor, f, indent=2)
+    os.replace(tmp_path, descriptor_path)
+
+    _prune(store_dir, keep=version, keep_versions=keep_versions)
+    return descriptor_path
+
+
+def _store_version(paths):
+    """Version of a set of artifacts: a short hash of their contents"""
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        digest.update(os.path.basename(path).encode('utf-8'))
+        digest.update(file_hash(path).encode('ascii'))
+    return digest.hexdigest()[:16]
+
+
+def _load_pickle(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def _ensure_dir(path):
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _prune(store_dir, keep, keep_versions):
+    """Delete the oldest version directories beyond ``keep_versions``"""
+    versions = [
+        entry for entry in os.scandir(store_dir)
+        if entry.is_dir() and not entry.name.startswith('.') and entry.name != keep
+    ]
+    versions.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in versions[max(0, keep_versions - 1):]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def read_descriptor(descriptor_path):
+    with open(descriptor_path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _map_array(version_dir, filename):
+    return np.load(os.path.join(version_dir, filename), mmap_mode='r', allow_pickle=False)
+
+
+def _map_table(version_dir, spec):
+    offsets = _map_array(version_dir, spec["offsets"])
+    with open(os.path.join(version_dir, spec["data"]), 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return StringTable(b"", offsets)
+        # mmap objects support find() and slicing, which is all StringTable needs
+        return StringTable(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), offsets)
+
+
+def attach(descriptor, name):
+    """Return a zero-copy view of one artifact from a published version"""
+    version_dir = descriptor["path"]
+    with open(os.path.join(version_dir, "artifacts.json"), encoding='utf-8') as f:
+        spec = json.load(f).get(name)
+    if spec is None:
+        raise FileNotFoundError(f"'{name}' is not published in {version_dir}")
+
+    if name == "popular_df":
+        return _load_pickle(os.path.join(version_dir, spec["pickle"]))
+    if name == "pt":
+        import pandas as pd
+        titles = _map_table(version_dir, spec["titles"])
+        # Stand-in for the pivot table: serving only uses pt.index
+        return types.SimpleNamespace(index=pd.Index([titles[i] for i in range(len(titles))]))
+    if name == "similarity_scores":
+        return _map_array(version_dir, spec["array"])
+    if name == "book_meta":
+        kwargs = {t: _map_table(version_dir, s) for t, s in spec["tables"].items()}
+        kwargs.update({c: _map_array(version_dir, f) for c, f in spec["columns"].items()})
+        return BookMetadata(**kwargs)
+    if name == "item_factors":
+        return FactorModel(_map_array(version_dir, spec["factors"]),
+                           _map_array(version_dir, spec["meta_rows"]), spec["n_meta_rows"])
+    if name == "user_index":
+        return UserIndex(**{field: _map_array(version_dir, f) for field, f in spec.items()})
+    if name == "candidates":
+        return CandidateIndex(**{field: _map_array(version_dir, f) for field, f in spec.items()})
+    if name == "content":
+        return ContentIndex(**{field: _map_array(version_dir, f) for field, f in spec.items()})
+    raise ValueError(f"Unknown artifact '{name}'")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish the models into the shared model store")
+    parser.add_argument('--model-dir', default='.', help="Directory containing the model artifacts")
+    parser.add_argument('--store-dir', default=DEFAULT_STORE_DIR, help="Shared store directory")
+    parser.add_argument('--keep-versions', type=int, default=2, help="Published versions to keep")
+    args = parser.parse_args()
+
+    try:
+        descriptor_path = publish(args.model_dir, args.store_dir, args.keep_versions)
+        descriptor = read_descriptor(descriptor_path)
+        print(f"✅ Published version {descriptor['version']} to {descriptor['path']}")
+        print(f"Start workers with MODEL_STORE={descriptor_path}")
+        return True
+    except Exception as e:
+        print(f"❌ Failed to publish models: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Single-file model snapshot for lightweight serving.
+
+generate_models.py writes ``model.snapshot``, one self-contained file with
+everything needed to answer /popular, /recommend and /search:
+
+- the book metadata string tables and columns (titles, authors, ...), which
+  double as the title dictionary (binary search over ``title_order``),
+- the top-k collaborative neighbors of every title in the CF model,
+- the content-based neighbors used as a cold-start fallback,
+- the popular list with its rating stats,
+- trigram postings over lowercased titles for substring search.
+
+Layout: an 8-byte magic, a little-endian uint64 header length, a JSON
+header, then every array as raw bytes at a 64-byte aligned offset. The
+reader memory-maps the file and wraps each array with ``np.frombuffer``, so
+opening a snapshot costs no parsing or copying and only needs NumPy: no
+pandas, scikit-learn or pickles.
+"""
+
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from metadata import SEPARATOR, BookMetadata, StringTable
+
+MAGIC = b"BRSNAP\x00\x01"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+# Neighbors stored per title (the API's maximum k)
+NEIGHBORS = 50
+
+# Above this many postings for its rarest trigram, a query is answered by
+# scanning the titles instead (the scan stops early at the result limit)
+DENSE_POSTINGS = 20000
+
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def title_trigrams(table):
+    """Trigram postings of a StringTable: ``(trigrams, offsets, rows)``.
+
+    ``trigrams`` are sorted 3-byte codes and the rows containing trigram
+    ``trigrams[i]`` are ``rows[offsets[i]:offsets[i + 1]]``, ascending.
+    """
+    start, end = int(table.offsets[0]), int(table.offsets[-1])
+    data = np.frombuffer(bytes(table.data[start:end]), dtype=np.uint8)
+    if len(data) < 3:
+        return np.empty(0, dtype=np.uint32), np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int32)
+
+    codes = (data[:-2].astype(np.uint32) << 16) | (data[1:-1].astype(np.uint32) << 8) | data[2:]
+    positions = np.flatnonzero((data[:-2] != 0) & (data[1:-1] != 0) & (data[2:] != 0))
+    rows = np.searchsorted(table.offsets - start, positions, side="right") - 1
+
+    # One posting per (trigram, row), sorted by trigram then row
+    keys = np.unique((codes[positions].astype(np.int64) << 32) | rows)
+    trigrams, starts = np.unique((keys >> 32).astype(np.uint32), return_index=True)
+    offsets = np.append(starts, len(keys)).astype(np.int64)
+    return trigrams, offsets, (keys & 0xFFFFFFFF).astype(np.int32)
+
+
+def _needle_trigrams(needle):
+    return sorted({(needle[i] << 16) | (needle[i + 1] << 8) | needle[i + 2] for i in range(len(needle) - 2)})
+
+
+def write_snapshot(path, arrays, tables, info=None):
+    """Write arrays and StringTables to a snapshot file (atomically).
+
+    ``arrays`` maps section names to arrays and ``tables`` maps names to
+    StringTables, stored as ``<name>.data`` and ``<name>.offsets`` sections
+    with offsets rebased to absolute file positions.
+    """
+    sections = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    for name, table in tables.items():
+        start, end = int(table.offsets[0]), int(table.offsets[-1])
+        sections[f"{name}.data"] = np.frombuffer(bytes(table.data[start:end]), dtype=np.uint8)
+        sections[f"{name}.offsets"] = table.offsets - start
+
+    layout, offset = {}, 0
+    for name, array in sections.items():
+        offset = _align(offset)
+        layout[name] = {"offset": offset, "dtype": array.dtype.str, "shape": list(array.shape)}
+        offset += array.nbytes
+
+    header = {"format": FORMAT_VERSION, "info": info or {}, "tables": sorted(tables), "sections": layout}
+    header_bytes = json.dumps(header, sort_keys=True).encode("utf-8")
+    data_start = _align(len(MAGIC) + 8 + len(header_bytes))
+
+    for name in tables:
+        sections[f"{name}.offsets"] = sections[f"{name}.offsets"] + (data_start + layout[f"{name}.data"]["offset"])
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in sections.items():
+            f.write(b"\x00" * (data_start + layout[name]["offset"] - f.tell()))
+            f.write(array.tobytes())
+    os.replace(tmp_path, path)
+
+
+class Snapshot:
+    """Read-only, memory-mapped view of a model snapshot"""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a model snapshot")
+
+        (header_length,) = struct.unpack_from("<Q", self._mmap, len(MAGIC))
+        header_start = len(MAGIC) + 8
+        header = json.loads(self._mmap[header_start:header_start + header_length])
+        if header["format"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format {header['format']}")
+        data_start = _align(header_start + header_length)
+
+        self.info = header["info"]
+        self.arrays = {
+            name: np.frombuffer(self._mmap, dtype=spec["dtype"], count=int(np.prod(spec["shape"])),
+                                offset=data_start + spec["offset"]).reshape(spec["shape"])
+            for name, spec in header["sections"].items()
+        }
+        tables = {name: StringTable(self._mmap, self.arrays[f"{name}.offsets"]) for name in header["tables"]}
+        self.book_meta = BookMetadata(**{name: tables[name] for name in BookMetadata.TABLES},
+                                      **{name: self.arrays[name] for name in BookMetadata.COLUMNS})
+
+        # Reverse index: metadata row -> row of the CF neighbor table (-1 when not covered)
+        self.cf_rows = np.full(len(self.book_meta), -1, dtype=np.int64)
+        self.cf_rows[self.arrays["cf_meta_rows"]] = np.arange(len(self.arrays["cf_meta_rows"]))
+
+    def popular_books(self):
+        """Get top 50 popular books"""
+        popular = []
+        for row, num_ratings, avg_rating in zip(self.arrays["popular_rows"].tolist(),
+                                                self.arrays["popular_num_ratings"].tolist(),
+                                                self.arrays["popular_avg_rating"].tolist()):
+            book = self.book_meta.record(row, ("title", "author", "image_url"))
+            book["num_ratings"] = num_ratings
+            book["avg_rating"] = avg_rating
+            popular.append(book)
+        return {
+            "message": "Top 50 Popular Books",
+            "count": len(popular),
+            "books": popular
+        }, 200
+
+    def recommend(self, book_name, k=5):
+        """Get book recommendations based on a book name.
+
+        Titles in the CF model get their precomputed neighbors; other catalog
+        titles get content-based neighbors backfilled with popular books.
+        """
+        book_meta = self.book_meta
+        meta_row = book_meta.row_of(book_name)
+        if meta_row < 0:
+            return {"error": f"Book '{book_name}' not found in dataset"}, 404
+
+        payload = {
+            "message": f"Recommendations for '{book_name}'",
+            "input_book": book_name,
+            "model": "cf",
+        }
+        cf_row = self.cf_rows[meta_row]
+        if cf_row >= 0:
+            rows = self.arrays["cf_neighbors"][cf_row, :k]
+            scores = self.arrays["cf_scores"][cf_row, :k]
+            sources = None
+        else:
+            rows, scores = self.arrays["content_neighbors"][meta_row], self.arrays["content_scores"][meta_row]
+            rows, scores = rows[rows >= 0], scores[rows >= 0]
+            popular = self.arrays["popular_rows"]
+            backfill = popular[(popular != meta_row) & ~np.isin(popular, rows)]
+            sources = (["content"] * len(rows) + ["popular"] * len(backfill))[:k]
+            rows = np.concatenate([rows, backfill])[:k]
+            scores = np.concatenate([scores, np.zeros(len(backfill))])[:k]
+            payload["fallback"] = "content"
+
+        recommendations = []
+        for i, (row, score) in enumerate(zip(rows.tolist(), scores.tolist())):
+            if row >= 0:
+                recommendation = book_meta.record(row, ("title", "author", "image_url"))
+                recommendation["similarity_score"] = score
+                if sources is not None:
+                    recommendation["source"] = sources[i]
+                recommendations.append(recommendation)
+        payload["recommendations"] = recommendations
+        return payload, 200
+
+    def search_rows(self, query, limit=20):
+        """Rows whose title or author contains ``query`` (case-insensitive).
+
+        Same results as BookMetadata.search, but title matches for queries of
+        three or more bytes come from the trigram postings.
+        """
+        book_meta = self.book_meta
+        query_lower = query.lower()
+        needle = query_lower.encode("utf-8")
+        if len(needle) < 3 or SEPARATOR in needle:
+            title_rows = book_meta.titles_lower.find(query_lower, limit=limit)
+        else:
+            title_rows = self._title_matches(needle, limit)
+        author_matches = book_meta.authors_lower.find(query_lower)
+        author_rows = np.flatnonzero(np.isin(book_meta.author_codes, author_matches))
+        return np.union1d(title_rows, author_rows)[:limit]
+
+    def _title_matches(self, needle, limit):
+        trigrams, offsets, postings = (self.arrays["search_trigrams"], self.arrays["search_offsets"],
+                                       self.arrays["search_rows"])
+        lists = []
+        for code in _needle_trigrams(needle):
+            i = int(np.searchsorted(trigrams, code))
+            if i == len(trigrams) or trigrams[i] != code:
+                return np.empty(0, dtype=np.int64)
+            lists.append(postings[offsets[i]:offsets[i + 1]])
+
+        # Common substrings match early in a plain scan, which stops at the limit
+        titles_lower = self.book_meta.titles_lower
+        lists.sort(key=len)
+        if len(lists[0]) > DENSE_POSTINGS:
+            return titles_lower.find(needle.decode("utf-8"), limit=limit)
+
+        # Intersect the shortest lists until few candidates remain, then
+        # confirm the substring
+        candidates = lists[0]
+        for rows in lists[1:]:
+            if len(candidates) <= 4 * limit:
+                break
+            candidates = np.intersect1d(candidates, rows, assume_unique=True)
+        found = []
+        for row in candidates.tolist():
+            if needle in titles_lower.get_bytes(row):
+                found.append(row)
+                if len(found) >= limit:
+                    break
+        return np.asarray(found, dtype=np.int64)
+
+    def search(self, query, limit=20):
+        """Search for books by title or author"""
+        results = [self.book_meta.record(row) for row in self.search_rows(query, limit).tolist()]
+        return {
+            "message": f"Search results for '{query}'",
+            "query": query,
+            "count": len(results),
+            "books": results
+        }, 200
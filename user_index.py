@@ -0,0 +1,56 @@
+"""
+Per-user ratings index for the collaborative filtering model.
+
+Stores, in CSR layout, which rows of the pivot table (``pt``) each user has
+rated and with what rating, so per-user recommendations can be scored
+straight from ``similarity_scores`` without touching the ratings frame.
+Saved by generate_models.py as ``user_index.npz``.
+"""
+
+import numpy as np
+
+from artifacts import save_npz
+
+
+class UserIndex:
+    """CSR user -> (pt rows, ratings) index"""
+
+    def __init__(self, user_ids, indptr, item_rows, ratings):
+        self.user_ids = np.asarray(user_ids, dtype=np.int64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.item_rows = np.asarray(item_rows, dtype=np.int32)
+        self.ratings = np.asarray(ratings, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    @classmethod
+    def from_ratings(cls, final_ratings, pt):
+        """Build the index from the filtered ratings used to build ``pt``"""
+        frame = final_ratings[["User-ID", "Book-Title", "Book-Rating"]].copy()
+        frame["User-ID"] = frame["User-ID"].astype(np.int64)
+        frame["item_row"] = pt.index.get_indexer(frame["Book-Title"])
+        # One entry per (user, title); pivot_table averages duplicate ISBNs too
+        frame = frame[frame["item_row"] >= 0].groupby(["User-ID", "item_row"], as_index=False)["Book-Rating"].mean()
+
+        user_ids, counts = np.unique(frame["User-ID"].to_numpy(), return_counts=True)
+        indptr = np.zeros(len(user_ids) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        return cls(user_ids, indptr, frame["item_row"].to_numpy(), frame["Book-Rating"].to_numpy())
+
+    def save(self, path):
+        save_npz(path, user_ids=self.user_ids, indptr=self.indptr,
+                 item_rows=self.item_rows, ratings=self.ratings)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as arrays:
+            return cls(arrays["user_ids"], arrays["indptr"], arrays["item_rows"], arrays["ratings"])
+
+    def items_of(self, user_id):
+        """Return ``(pt rows, ratings)`` for a user, or None if unknown"""
+        i = int(np.searchsorted(self.user_ids, user_id))
+        if i == len(self.user_ids) or self.user_ids[i] != user_id:
+            return None
+        start, end = self.indptr[i], self.indptr[i + 1]
+        return self.item_rows[start:end], self.ratings[start:end]